@@ -0,0 +1,70 @@
+from flask import request, make_response
+from flask_restful import Resource
+from sqlalchemy import func
+
+from tools import db
+
+from ...models.reports import SecurityReport
+from ...models.results import SecurityResultsSAST
+from ...serializers.columnar import findings_serializer
+
+DIFF_COLUMNS = ['id', 'issue_hash', 'tool_name', 'description', 'severity', 'status', 'endpoints']
+
+
+class API(Resource):
+    url_params = [
+        '<int:project_id>/<int:result_id>',
+    ]
+
+    def __init__(self, module):
+        self.module = module
+
+    def get(self, project_id: int, result_id: int):
+        """ New, fixed and persistent findings compared to base_id or to the previous run of the test """
+        args = request.args
+        result = SecurityResultsSAST.query.filter(
+            SecurityResultsSAST.project_id == project_id,
+            SecurityResultsSAST.id == result_id,
+        ).first()
+        if not result:
+            return make_response({"message": "Result not found"}, 404)
+
+        base_query = SecurityResultsSAST.query.with_entities(
+            SecurityResultsSAST.id, SecurityResultsSAST.archived_at
+        ).filter(
+            SecurityResultsSAST.project_id == project_id,
+        )
+        if args.get("base_id"):
+            base = base_query.filter(SecurityResultsSAST.id == args.get("base_id", type=int)).first()
+        else:
+            base = base_query.filter(
+                SecurityResultsSAST.test_uid == result.test_uid,
+                SecurityResultsSAST.id < result.id,
+            ).order_by(SecurityResultsSAST.id.desc()).first()
+        if not base:
+            return make_response({"message": "Nothing to compare with"}, 404)
+        if result.archived_at or base.archived_at:
+            return make_response({"message": "Archived results can not be compared"}, 409)
+
+        severities = [i.strip().lower() for i in args.get("severity", "").split(",") if i.strip()]
+        if set(severities).difference(SecurityReport.SEVERITY_CHOICES):
+            return make_response({"message": f"severity must be one of {tuple(SecurityReport.SEVERITY_CHOICES)}"}, 400)
+        include = [i.strip() for i in args.get("include", "new,fixed,persistent").split(",") if i.strip()]
+
+        response = {"result_id": result.id, "base_id": base.id}
+        for category, filter_ in SecurityReport.diff_filters(result.id, base.id).items():
+            filter_ = [SecurityReport.project_id == project_id, *filter_]
+            if severities:
+                filter_.append(SecurityReport.severity.in_(severities))
+            counts = dict(
+                db.session.query(SecurityReport.severity, func.count(SecurityReport.id)).filter(
+                    *filter_
+                ).group_by(SecurityReport.severity).all()
+            )
+            response[category] = {"total": sum(counts.values()), "severity": counts}
+            if category in include:
+                rows = db.session.query(*findings_serializer.entities(DIFF_COLUMNS)).filter(
+                    *filter_
+                ).order_by(SecurityReport.id).limit(args.get("limit", type=int))
+                response[category]["rows"] = findings_serializer.dump(DIFF_COLUMNS, rows)
+        return response, 200
@@ -1,3 +1,5 @@
+from copy import deepcopy
+
 from flask_restful import Resource
 from sqlalchemy import and_
 
@@ -6,9 +8,12 @@ from sqlalchemy import and_
 
 from ...models.tests import SecurityTestsSAST
 from ...models.thresholds import SecurityThresholds
+from ...caches import execution_configs
 from flask import request, make_response
 from pylon.core.tools import log  # pylint: disable=E0611,E0401
 
+TIMED_OUT_HEADER = 'X-Timed-Out-Integrations'
+
 
 class API(Resource):
     url_params = [
@@ -42,5 +47,30 @@ class API(Resource):
                 thresholds = thresholds['params']
             except AttributeError:
                 thresholds = {}
-            return test.configure_execution_json(args.get("type"), thresholds=thresholds)
+            if args.get("type") != "dusty":
+                return test.configure_execution_json(args.get("type"), thresholds=thresholds)
+
+            if request.if_none_match:
+                # unchanged config is confirmed without calling integrations plugin
+                version = test.config_version(thresholds, cached_only=True)
+                if version and test.config_etag(version) in request.if_none_match:
+                    return make_response('', 304, {'ETag': f'"{test.config_etag(version)}"', TIMED_OUT_HEADER: ''})
+
+            version = test.config_version(thresholds)
+            if version is None:
+                config, timed_out = test.dusty_config(thresholds)
+                log.warning('Integrations settings of %s are not available, config is not cached', seed)
+                return config, 200, {TIMED_OUT_HEADER: ','.join(timed_out)}
+            etag = test.config_etag(version)
+            if etag in request.if_none_match:
+                return make_response('', 304, {'ETag': f'"{etag}"', TIMED_OUT_HEADER: ''})
+            config = execution_configs.get(version)
+            if config is None:
+                config, timed_out = test.dusty_config(thresholds)
+                if timed_out:
+                    # incomplete config is neither cached nor versioned
+                    log.warning('Config of %s is built without %s', seed, timed_out)
+                    return config, 200, {TIMED_OUT_HEADER: ','.join(timed_out)}
+                execution_configs.set(version, config)
+            return test.fill_run_fields(deepcopy(config)), 200, {'ETag': f'"{etag}"', TIMED_OUT_HEADER: ''}
         return make_response(f'Unknown test type {test_type}', 400)
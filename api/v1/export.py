@@ -0,0 +1,66 @@
+import zlib
+
+from flask import Response, request, make_response, stream_with_context
+from flask_restful import Resource
+
+from ...models.reports import SecurityReport
+from ...models.results import SecurityResultsSAST
+from ...serializers.export import csv_chunks, jsonl_chunks, sarif_chunks
+from ...export import iter_findings
+from ...retention import iter_archived_findings, iter_archived_findings_by_tool
+
+EXPORT_FORMATS = {
+    'csv': (csv_chunks, 'text/csv', 'csv'),
+    'jsonl': (jsonl_chunks, 'application/x-ndjson', 'jsonl'),
+    'sarif': (sarif_chunks, 'application/sarif+json', 'sarif'),
+}
+EXPORT_COLUMNS = ['id', 'issue_hash', 'tool_name', 'description', 'severity', 'status', 'endpoints']
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class API(Resource):
+    url_params = [
+        '<int:project_id>/<int:result_id>',
+    ]
+
+    def __init__(self, module):
+        self.module = module
+
+    def get(self, project_id: int, result_id: int):
+        """ Streams findings of a result as csv, jsonl or sarif """
+        export_format = request.args.get('format', 'jsonl')
+        if export_format not in EXPORT_FORMATS:
+            return make_response({"message": f"format must be one of {tuple(EXPORT_FORMATS)}"}, 400)
+        result = SecurityResultsSAST.query.filter(
+            SecurityResultsSAST.project_id == project_id,
+            SecurityResultsSAST.id == result_id,
+        ).first()
+        if not result:
+            return make_response({"message": "Result not found"}, 404)
+
+        formatter, mimetype, extension = EXPORT_FORMATS[export_format]
+        order_by = (SecurityReport.tool_name,) if export_format == 'sarif' else ()
+        if result.archived_at and export_format == 'sarif':
+            findings = iter_archived_findings_by_tool(result, EXPORT_COLUMNS)
+        elif result.archived_at:
+            findings = iter_archived_findings(result, EXPORT_COLUMNS)
+        else:
+            findings = iter_findings(project_id, result_id, EXPORT_COLUMNS, order_by=order_by)
+        chunks = formatter(findings)
+        filename = f'{result.sanitize(result.test_name or "")}_{result_id}.{extension}'
+        if request.args.get('compress') == 'gzip':
+            chunks = gzip_chunks(chunks)
+            mimetype, filename = 'application/gzip', f'{filename}.gz'
+        return Response(
+            stream_with_context(chunks),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
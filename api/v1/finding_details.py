@@ -0,0 +1,39 @@
+from flask import request, make_response
+from flask_restful import Resource
+
+from tools import db
+
+from ...models.reports import SecurityReport
+from ...models.details import SecurityDetails
+from ...models.results import SecurityResultsSAST
+from ...retention import get_archived_finding
+
+
+class API(Resource):
+    url_params = [
+        '<int:project_id>/<int:finding_id>',
+    ]
+
+    def __init__(self, module):
+        self.module = module
+
+    def get(self, project_id: int, finding_id: int):
+        details = db.session.query(SecurityDetails.details).join(
+            SecurityReport, SecurityDetails.id == SecurityReport.details
+        ).filter(
+            SecurityReport.project_id == project_id,
+            SecurityReport.id == finding_id,
+        ).first()
+        if details:
+            return {"id": finding_id, "details": details[0]}, 200
+        # findings of archived results are looked up in the archive of report_id
+        result = SecurityResultsSAST.query.filter(
+            SecurityResultsSAST.project_id == project_id,
+            SecurityResultsSAST.id == request.args.get("report_id", type=int),
+            SecurityResultsSAST.archived_at.is_not(None),
+        ).first()
+        if result:
+            finding = get_archived_finding(result, finding_id)
+            if finding:
+                return {"id": finding_id, "details": finding['details']}, 200
+        return make_response({"message": "Finding not found"}, 404)
@@ -1,14 +1,35 @@
-import hashlib
+import gzip
+import json
+from collections import defaultdict
+from itertools import chain, islice
 
 from flask import request, abort, make_response
 from flask_restful import Resource
-from sqlalchemy import and_, or_, asc
+from sqlalchemy import func, null, text
+from sqlalchemy.exc import OperationalError
+
+from tools import db
 
 from ...models.reports import SecurityReport
 from ...models.details import SecurityDetails
 from ...models.results import SecurityResultsSAST
+from ...models.triage import SecurityTriage
+from ...models.ingestion_jobs import SecurityIngestionJob
+from ...models.search import findings_search, is_postgres
+from ...serializers.columnar import findings_serializer, requested_fields, cursor_fields
+from ...utils import ValidationErrorPD
+from ...ingestion import (
+    ingest_findings, ingest_findings_stream, iter_ndjson, store_ingestion_payload, remove_ingestion_payload
+)
+from ...pagination import get_total, keyset_paginate, TOTAL_MODES
+from ...retention import iter_archived_findings, read_archive_manifest
 from pylon.core.tools import log  # pylint: disable=E0611,E0401
 
+DETAILS_MODES = ('none', 'summary', 'full')
+DETAILS_SUMMARY_LENGTH = 256
+SEARCH_TIMEOUT_MS = 5000
+ARCHIVE_SEARCH_FIELDS = ('tool_name', 'description', 'details')
+
 
 class API(Resource):
     url_params = [
@@ -20,40 +41,140 @@ class API(Resource):
         self.module = module
 
     def _calcualte_limit(self, limit, total):
-        return total if limit == 'All' or limit == 0 else limit
+        return None if limit == 'All' or limit == 0 else limit
+
+    def get(self, project_id: int, test_id: int = None):
+        if not request.args.get("search") or not is_postgres():
+            return self._get(project_id, test_id)
+        # keep search within latency budget
+        db.session.execute(text(f"SET LOCAL statement_timeout = {SEARCH_TIMEOUT_MS}"))
+        try:
+            response = self._get(project_id, test_id)
+        except OperationalError:
+            db.session.rollback()
+            return make_response({"message": "Search took too long, please refine the query"}, 503)
+        db.session.execute(text("SET LOCAL statement_timeout TO DEFAULT"))
+        return response
 
-    def get(self, project_id: int, test_id: int):
+    def _get(self, project_id: int, test_id: int = None):
         args = request.args
         limit_ = args.get("limit")
         offset_ = args.get("offset")
 
-        filter_ = [
-            SecurityReport.project_id == project_id,
-            SecurityReport.report_id == test_id
-        ]
+        filter_ = [SecurityReport.project_id == project_id]
+        if test_id is not None:
+            filter_.append(SecurityReport.report_id == test_id)
 
         if args.get("status"):
             filter_.append(SecurityReport.status.ilike(args["status"]))
 
-        # sorting
-        if args.get("sort"):
-            sort_rule = getattr(getattr(SecurityReport, args["sort"]), args["order"])()
+        search_rank = None
+        if args.get("search"):
+            search_filter, search_rank = findings_search(project_id, args["search"])
+            filter_.append(search_filter)
+
+        details_mode = args.get("details", "full")
+        if details_mode not in DETAILS_MODES:
+            return make_response({"message": f"details must be one of {DETAILS_MODES}"}, 400)
+        total_mode = args.get("total", "exact")
+        if total_mode not in TOTAL_MODES:
+            return make_response({"message": f"total must be one of {TOTAL_MODES}"}, 400)
+
+        fields = requested_fields(args)
+        with_details = not fields or "details" in fields
+        try:
+            columns = findings_serializer.parse_fields(
+                [i for i in fields if i != "details"], required=cursor_fields(args)
+            )
+        except ValueError as e:
+            return make_response({"message": str(e)}, 400)
+
+        if test_id is not None:
+            result = SecurityResultsSAST.query.get(test_id)
+            if result and result.project_id == project_id and result.archived_at:
+                if "cursor" in args:
+                    return make_response({"message": "Archived results are paginated with offset"}, 400)
+                return self._get_archived(result, columns, with_details and details_mode), 200
+
+        total = get_total(SecurityReport.query.filter(*filter_), total_mode)
+        entities = findings_serializer.entities(columns)
+        if not with_details or details_mode == "none":
+            details_column = null()
+        elif details_mode == "full":
+            details_column = SecurityDetails.details
         else:
-            sort_rule = SecurityReport.id.desc()
+            details_column = func.substr(SecurityDetails.details, 1, DETAILS_SUMMARY_LENGTH)
+        query = db.session.query(*entities, details_column).select_from(SecurityReport)
+        if with_details and details_mode != "none":
+            query = query.outerjoin(SecurityDetails, SecurityDetails.id == SecurityReport.details)
+        query = query.filter(*filter_)
 
-        total = SecurityReport.query.filter(*filter_).count()
-        issues = SecurityReport.query.filter(*filter_).order_by(sort_rule)\
+        response = {"total": total}
+        if "cursor" in args:
+            try:
+                issues, response["next_cursor"] = keyset_paginate(query, SecurityReport, args)
+            except ValidationErrorPD as e:
+                return make_response(e.dict(), 400)
+        else:
+            # sorting
+            if args.get("sort"):
+                sort_rule = getattr(getattr(SecurityReport, args["sort"]), args["order"])()
+            elif search_rank is not None:
+                sort_rule = search_rank
+            else:
+                sort_rule = SecurityReport.id.desc()
+            issues = query.order_by(sort_rule)\
                 .limit(self._calcualte_limit(limit_, total))\
-                .offset(offset_)
+                .offset(offset_).all()
+
+        results = findings_serializer.dump(columns, issues)
+        if with_details:
+            for row, issue in zip(results, issues):
+                row["details"] = issue[-1]
+        response["rows"] = results
+        return response, 200
 
-        results = []
-        for issue in issues:
-            _res = issue.to_json()
-            _res["details"] = SecurityDetails.query.filter_by(id=_res["details"]).first().details
-            results.append(_res)
-        return {"total": total, "rows": results}, 200
+    def _get_archived(self, result: SecurityResultsSAST, columns: list, details_mode) -> dict:
+        """ Rehydrates findings of a result moved to cold archive by retention policy """
+        args = request.args
+        status = args.get("status", "").replace("_", " ").lower()
+        search = args.get("search", "").lower()
+        offset_ = args.get("offset", 0, type=int)
+        limit_ = self._calcualte_limit(args.get("limit", type=int), None)
 
+        if not status and not search and not args.get("sort"):
+            # archive is stored in default order, only parts the page falls into are read
+            manifest = read_archive_manifest(result)
+            total = manifest["total"]
+            page = list(islice(
+                chain.from_iterable(iter_archived_findings(result, offset=offset_, manifest=manifest)), limit_
+            ))
+        else:
+            issues = []
+            for batch in iter_archived_findings(result):
+                issues.extend(
+                    i for i in batch
+                    if (not status or i["status"].lower() == status)
+                    and (not search or any(search in (i.get(k) or "").lower() for k in ARCHIVE_SEARCH_FIELDS))
+                )
+            if args.get("sort"):
+                key = findings_serializer.rename.get(args["sort"], args["sort"])
+                issues.sort(key=lambda i: (i.get(key) is None, i.get(key)), reverse=args.get("order") == "desc")
+            total = len(issues)
+            page = issues[offset_:offset_ + limit_ if limit_ else None]
 
+        keys = [findings_serializer.rename.get(i, i) for i in columns]
+        rows = []
+        for issue in page:
+            row = {k: issue.get(k) for k in keys}
+            if details_mode == "full":
+                row["details"] = issue.get("details")
+            elif details_mode == "summary":
+                row["details"] = (issue.get("details") or "")[:DETAILS_SUMMARY_LENGTH]
+            elif details_mode == "none":
+                row["details"] = None
+            rows.append(row)
+        return {"total": total, "rows": rows, "archived": True}
 
     def put(self, project_id: int, test_id: int):
         args = request.json
@@ -64,12 +185,14 @@ class API(Resource):
         assert issues or issue_hashes, abort(400, data={"message": "No issues provided"})
 
         if args.get("severity"):
-            update_value = {"severity": args["severity"].replace(" ", "_")}
+            field = "severity"
         elif args.get("status"):
-            update_value = {"status": args["status"].replace(" ", "_")}
+            field = "status"
         else:
             abort(400, data={"message": "Action is invalid"})
+        update_value = {field: args[field].replace(" ", "_")}
 
+        issue_hashes = list(issue_hashes or [])
         if issues:
             issue_hashes.extend(
                 SecurityReport.query.filter(
@@ -79,83 +202,95 @@ class API(Resource):
                 ).values('issue_hash', flat=True)
             )
 
-        SecurityReport.query.filter(
+        affected = SecurityReport.query.filter(
             SecurityReport.report_id == test_id,
             SecurityReport.project_id == project_id,
             SecurityReport.issue_hash.in_(set(issue_hashes)),
-        ).update(update_value)
+        )
+        column = getattr(SecurityReport, field)
+        counts_delta = defaultdict(int)
+        for value, count in affected.with_entities(column, func.count(SecurityReport.id)).group_by(column):
+            counts_delta[value] -= count
+            counts_delta[update_value[field].lower()] += count
+
+        affected.update(update_value, synchronize_session=False)
+        SecurityTriage.upsert(project_id, set(issue_hashes), **update_value)
+        SecurityResultsSAST.apply_counts_delta({test_id: counts_delta})
         SecurityReport.commit()
+        return make_response(accept_message, 204)
 
-        results = SecurityResultsSAST.query.filter(
-            and_(
-                SecurityResultsSAST.project_id == project_id,
-                SecurityResultsSAST.id == test_id
-            )
+    def post(self, project_id: int, *args, **kvargs):
+        if request.args.get('mode') == 'async':
+            return self._post_async(project_id, kvargs.get('test_id') or request.args.get('report_id', type=int))
+        if request.mimetype == 'application/x-ndjson':
+            return self._post_stream(project_id)
+        if not ingest_findings(project_id, request.json):
+            return make_response('No findings passed', 400)
+        return make_response('ok', 204)
+
+    def _post_stream(self, project_id: int):
+        stream = request.stream
+        if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+            stream = gzip.GzipFile(fileobj=stream, mode='rb')
+        chunks = []
+        try:
+            for count in ingest_findings_stream(project_id, iter_ndjson(stream)):
+                chunks.append(count)
+                log.info('Findings ingestion for project %s: chunk %s stored %s findings',
+                         project_id, len(chunks), count)
+        except ValidationErrorPD as e:
+            return make_response({**e.dict(), 'chunks': chunks, 'total': sum(chunks)}, 400)
+        except (OSError, EOFError) as e:
+            return make_response({'msg': f'Invalid gzip stream: {e}', 'chunks': chunks, 'total': sum(chunks)}, 400)
+        if not chunks:
+            return make_response('No findings passed', 400)
+        return make_response({'chunks': chunks, 'total': sum(chunks)}, 200)
+
+    def _post_async(self, project_id: int, report_id: int):
+        result = SecurityResultsSAST.query.filter(
+            SecurityResultsSAST.project_id == project_id,
+            SecurityResultsSAST.id == report_id,
         ).first()
+        if not result:
+            return make_response({'message': 'Result not found'}, 404)
 
-        if args.get("status"):
-            results.update_status_counts()
+        stream = request.stream
+        if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+            stream = gzip.GzipFile(fileobj=stream, mode='rb')
+        if request.mimetype == 'application/x-ndjson':
+            findings = iter_ndjson(stream)
+        else:
+            # json list is converted to ndjson parts here, so that workers never load it whole
+            try:
+                findings = json.load(stream)
+            except (ValueError, gzip.BadGzipFile, EOFError) as e:
+                return make_response({'message': f'Invalid json: {e}'}, 400)
 
-        if args.get("severity"):
-            results.update_severity_counts()
+        job = SecurityIngestionJob(
+            project_id=project_id,
+            report_id=result.id,
+            content_type=request.mimetype,
+            status=SecurityIngestionJob.UPLOADING,
+        )
+        job.insert()
+        try:
+            # part names come from job id, so the job exists before its payload does
+            store_ingestion_payload(job, result, findings)
+        except (ValidationErrorPD, gzip.BadGzipFile, EOFError) as e:
+            return self._fail_async_job(job, result, f'Invalid payload: {e}', 400)
+        except Exception as e:
+            log.exception('Findings payload upload for job %s failed', job.id)
+            return self._fail_async_job(job, result, f'Payload upload failed: {e}', 502)
+        job.status = SecurityIngestionJob.PENDING
+        job.commit()
 
-        results.update_findings_counts()
-        return make_response(accept_message, 204)
+        self.module.ingestion_queue.submit(job)
+        return make_response({'job_id': job.id, 'status': job.status}, 202)
 
-    def post(self, project_id: int, *args, **kvargs):
-        finding_db = None
-        log.info(request.json)
-        for finding in request.json:
-            md5 = hashlib.md5(finding["details"].encode("utf-8")).hexdigest()
-            hash_id = SecurityDetails.query.filter(
-                and_(SecurityDetails.project_id == project_id, SecurityDetails.detail_hash == md5)
-            ).first()
-            if not hash_id:
-                hash_id = SecurityDetails(detail_hash=md5, project_id=project_id, details=finding["details"])
-                hash_id.insert()
-            # Verify issue is false_positive or ignored
-            finding["details"] = hash_id.id
-            finding['project_id'] = project_id
-            # finding['report_id'] = test_id
-
-            entrypoints = ""
-            for endpoint in finding.get("endpoints", []):
-                if isinstance(endpoint, list):
-                    entrypoints += "<br />".join(endpoint)
-                else:
-                    entrypoints += f"<br />{endpoint}"
-            finding["endpoints"] = entrypoints
-
-            issue = SecurityReport.query.filter(and_(
-                SecurityReport.project_id == project_id,
-                SecurityReport.issue_hash == finding['issue_hash'])).first()
-            if issue:
-                finding['severity'] = issue.severity
-            if not (finding.get("false_positive") == 1 or finding.get("excluded_finding") == 1):
-                # todo: query sum from db?
-                issues = SecurityReport.query.filter(
-                    and_(SecurityReport.project_id == project_id,
-                         SecurityReport.issue_hash == finding["issue_hash"],
-                         or_(SecurityReport.status == "False_Positive",
-                             SecurityReport.status == "Ignored")
-                         )).all()
-                false_positive = sum([1 for issue in issues if issue.status == "False_Positive"])
-                excluded_finding = sum([1 for issue in issues if issue.status == "Ignored"])
-
-                finding["status"] = "False_Positive" if false_positive > 0 else "Not_defined"
-                finding["status"] = "Ignored" if excluded_finding > 0 else "Not_defined"
-
-                # TODO: wrap this to try-except or delete from requests
-                for k in ['false_positive', 'excluded_finding', 'info_finding']:
-                    try:
-                        del finding[k]
-                    except KeyError:
-                        pass
-            finding_db = SecurityReport(**finding)
-            finding_db.add()
-            # print('POSTED', finding_db)
-
-        if finding_db:
-            finding_db.commit()
-            return make_response('ok', 204)
-        return make_response('No findings passed', 400)
+    @staticmethod
+    def _fail_async_job(job: SecurityIngestionJob, result: SecurityResultsSAST, error: str, code: int):
+        remove_ingestion_payload(job, result)
+        job.status = SecurityIngestionJob.FAILED
+        job.error = error
+        job.commit()
+        return make_response({'job_id': job.id, 'status': job.status, 'error': job.error}, code)
@@ -0,0 +1,22 @@
+from flask import make_response
+from flask_restful import Resource
+
+from ...models.ingestion_jobs import SecurityIngestionJob
+
+
+class API(Resource):
+    url_params = [
+        '<int:project_id>/<int:job_id>',
+    ]
+
+    def __init__(self, module):
+        self.module = module
+
+    def get(self, project_id: int, job_id: int):
+        job = SecurityIngestionJob.query.filter(
+            SecurityIngestionJob.project_id == project_id,
+            SecurityIngestionJob.id == job_id,
+        ).first()
+        if not job:
+            return make_response({"message": "Job not found"}, 404)
+        return job.to_json(), 200
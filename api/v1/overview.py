@@ -0,0 +1,29 @@
+from flask import request, make_response
+from flask_restful import Resource
+
+from ...models.overview import SecurityOverview
+from ...pagination import time_range_filter
+
+
+class API(Resource):
+    url_params = [
+        '<int:project_id>',
+    ]
+
+    def __init__(self, module):
+        self.module = module
+
+    def get(self, project_id: int):
+        """ Project totals with counters bucketed by period of results start date """
+        args = request.args
+        period = args.get('period', 'day')
+        if period not in SecurityOverview.PERIODS:
+            return make_response({"message": f"period must be one of {SecurityOverview.PERIODS}"}, 400)
+        try:
+            time_range = time_range_filter(SecurityOverview.bucket, args)
+        except ValueError as e:
+            return make_response({"message": str(e)}, 400)
+        return {
+            'total': SecurityOverview.get_total(project_id),
+            'series': SecurityOverview.get_series(project_id, period, time_range),
+        }, 200
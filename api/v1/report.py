@@ -2,10 +2,16 @@ from datetime import datetime
 
 from flask import request, make_response
 from flask_restful import Resource
-from sqlalchemy import and_, or_, desc
+from sqlalchemy import and_, desc
+
+from tools import db
 
-from ...models.reports import SecurityReport
 from ...models.results import SecurityResultsSAST
+from ...models.search import results_search
+from ...serializers.columnar import reports_serializer, requested_fields, cursor_fields
+from ...utils import ValidationErrorPD, parse_scan_seconds
+from ...pagination import get_total, keyset_paginate, time_range_filter, TOTAL_MODES
+from ...cleanup import delete_results
 
 
 class API(Resource):
@@ -17,56 +23,62 @@ class API(Resource):
         self.module = module
 
     def get(self, project_id: int):
-        reports = []
         args = request.args
         search_ = args.get("search")
         limit_ = args.get("limit")
         offset_ = args.get("offset")
         scan_type = args.get("type").upper()
-        if args.get("sort"):
-            sort_rule = getattr(getattr(SecurityResultsSAST, args["sort"]), args["order"])()
-        else:
-            sort_rule = SecurityResultsSAST.id.desc()
-        if not args.get("search") and not args.get("sort"):
-            total = SecurityResultsSAST.query.filter(
-                and_(SecurityResultsSAST.project_id == project_id,
-                     SecurityResultsSAST.scan_type == scan_type)
-            ).order_by(sort_rule).count()
-            res = SecurityResultsSAST.query.filter(
-                and_(SecurityResultsSAST.project_id == project_id,
-                     SecurityResultsSAST.scan_type == scan_type)
-            ).order_by(sort_rule).limit(limit_).offset(offset_).all()
+        total_mode = args.get("total", "exact")
+        if total_mode not in TOTAL_MODES:
+            return make_response({"message": f"total must be one of {TOTAL_MODES}"}, 400)
+        filter_ = and_(SecurityResultsSAST.project_id == project_id,
+                       SecurityResultsSAST.scan_type == scan_type)
+        if search_:
+            filter_ = and_(filter_, results_search(search_))
+        try:
+            time_range = time_range_filter(SecurityResultsSAST.scanned_at, args)
+        except ValueError as e:
+            return make_response({"message": str(e)}, 400)
+        if time_range is not None:
+            filter_ = and_(filter_, time_range)
+        try:
+            columns = reports_serializer.parse_fields(requested_fields(args), required=cursor_fields(args))
+        except ValueError as e:
+            return make_response({"message": str(e)}, 400)
+        query = db.session.query(*reports_serializer.entities(columns)).filter(filter_)
+        total = get_total(query, total_mode)
+        response = {"total": total}
+        if "cursor" in args:
+            try:
+                res, response["next_cursor"] = keyset_paginate(query, SecurityResultsSAST, args)
+            except ValidationErrorPD as e:
+                return make_response(e.dict(), 400)
         else:
-            filter_ = and_(SecurityResultsSAST.project_id == project_id, SecurityResultsSAST.scan_type == scan_type,
-                           or_(SecurityResultsSAST.project_name.like(f"%{search_}%"),
-                               SecurityResultsSAST.app_name.like(f"%{search_}%"),
-                               SecurityResultsSAST.scan_type.like(f"%{search_}%"),
-                               SecurityResultsSAST.environment.like(f"%{search_}%")))
-            res = SecurityResultsSAST.query.filter(filter_).order_by(sort_rule).limit(limit_).offset(offset_).all()
-            total = SecurityResultsSAST.query.filter(filter_).order_by(sort_rule).count()
-        for each in res:
-            each_json = each.to_json()
-            each_json["scan_time"] = each_json["scan_time"].replace("T", " ").split(".")[0]
-            each_json["scan_duration"] = float(each_json["scan_duration"])
-            reports.append(each_json)
-        return make_response({"total": total, "rows": reports}, 200)
+            if args.get("sort"):
+                sort_rule = SecurityResultsSAST.sort_rule(args["sort"], args["order"])
+            else:
+                sort_rule = SecurityResultsSAST.id.desc()
+            res = query.order_by(sort_rule).limit(limit_).offset(offset_).all()
+        response["rows"] = reports_serializer.dump(columns, res)
+        return make_response(response, 200)
 
     def delete(self, project_id: int):
         args = request.args
         # project = Project.get_or_404(project_id)
         project = self.module.context.rpc_manager.call.project_get_or_404(project_id)
-        for each in SecurityReport.query.filter(
-                and_(SecurityReport.project_id == project.id, SecurityReport.report_id.in_(args["id[]"]))
-        ).order_by(SecurityReport.id.asc()).all():
-            each.delete()
-        for each in SecurityResultsSAST.query.filter(
-                SecurityResultsSAST.id.in_(args["id[]"])
-        ).order_by(SecurityResultsSAST.id.asc()).all():
-            each.delete()
+        try:
+            delete_ids = [int(i) for value in args.getlist("id[]") for i in value.split(',') if i]
+        except ValueError:
+            return make_response('IDs must be integers', 400)
+        delete_results(project.id, delete_ids, self.module.cleanup_executor)
         return {"message": "deleted"}
 
     def post(self, project_id: int):
         args = request.json
+        try:
+            scan_seconds = parse_scan_seconds(args.get("scan_time"))
+        except ValidationErrorPD as e:
+            return e.dict(), 400
         self.module.context.rpc_manager.call.project_get_or_404(project_id)
 
         # TODO move sast/dast quota checks to a new endpoint, which will be triggered before the scan
@@ -87,10 +99,13 @@ class API(Resource):
         report = SecurityResultsSAST.query.filter(SecurityResultsSAST.project_id == project_id).order_by(
             desc(SecurityResultsSAST.id)).first()
 
+        scanned_at = datetime.utcnow().replace(microsecond=0)
         upd = dict(
-            scan_time=datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+            scan_time=scanned_at.strftime("%Y-%m-%d %H:%M:%S"),
+            scanned_at=scanned_at,
             # project_id=project.id,
-            scan_duration=args["scan_time"],
+            scan_duration=None if scan_seconds is None else str(args["scan_time"]),
+            scan_seconds=scan_seconds,
             # project_name=args["project_name"],
             app_name=args["app_name"],
             dast_target=args["dast_target"],
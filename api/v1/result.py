@@ -5,6 +5,7 @@ from flask_restful import Resource
 from pylon.core.tools import log  # pylint: disable=E0611,E0401
 
 from ...models.results import SecurityResultsSAST
+from ...utils import ValidationErrorPD, parse_scan_seconds
 
 
 class API(Resource):
@@ -24,6 +25,10 @@ class API(Resource):
 
     def post(self, project_id: int, result_id: int):
         args = request.json
+        try:
+            scan_seconds = parse_scan_seconds(args.get("scan_time"))
+        except ValidationErrorPD as e:
+            return e.dict(), 400
         self.module.context.rpc_manager.call.project_get_or_404(project_id)
 
         # TODO move sast/dast quota checks to a new endpoint, which will be triggered before the scan
@@ -39,10 +44,13 @@ class API(Resource):
             SecurityResultsSAST.id == result_id,
         ).one()
 
+        scanned_at = datetime.utcnow().replace(microsecond=0)
         upd = dict(
-            scan_time=datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+            scan_time=scanned_at.strftime("%Y-%m-%d %H:%M:%S"),
+            scanned_at=scanned_at,
             # project_id=project.id,
-            scan_duration=args["scan_time"],
+            scan_duration=None if scan_seconds is None else str(args["scan_time"]),
+            scan_seconds=scan_seconds,
             # project_name=args["project_name"],
             app_name=args["app_name"],
             dast_target=args["dast_target"],
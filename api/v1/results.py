@@ -1,9 +1,13 @@
 from flask import make_response, request
 from flask_restful import Resource
-
-from tools import api_tools
+from sqlalchemy import and_
 
 from ...models.results import SecurityResultsSAST
+from ...models.search import results_search
+from ...serializers.columnar import results_serializer, requested_fields, cursor_fields
+from ...utils import ValidationErrorPD
+from ...pagination import get_listing, time_range_filter
+from ...cleanup import delete_results
 
 
 class API(Resource):
@@ -16,22 +20,34 @@ class API(Resource):
 
     def get(self, project_id: int):
         args = request.args
-        reports = []
-        total, res = api_tools.get(project_id, args, SecurityResultsSAST)
-        for each in res:
-            reports.append(each.to_json())
-        return make_response({"total": total, "rows": reports}, 200)
+        try:
+            columns = results_serializer.parse_fields(requested_fields(args), required=cursor_fields(args))
+            additional_filter = [
+                i for i in (
+                    results_search(args["search"]) if args.get("search") else None,
+                    time_range_filter(SecurityResultsSAST.start_date, args),
+                ) if i is not None
+            ]
+            total, res, next_cursor = get_listing(
+                project_id, args, SecurityResultsSAST,
+                entities=results_serializer.entities(columns),
+                additional_filter=and_(*additional_filter) if additional_filter else None,
+            )
+        except ValueError as e:
+            return make_response({"message": str(e)}, 400)
+        except ValidationErrorPD as e:
+            return make_response(e.dict(), 400)
+        response = {"total": total, "rows": results_serializer.dump(columns, res)}
+        if "cursor" in args:
+            response["next_cursor"] = next_cursor
+        return make_response(response, 200)
 
 
     def delete(self, project_id: int):
         project = self.module.context.rpc_manager.call.project_get_or_404(project_id=project_id)
         try:
             delete_ids = list(map(int, request.args["id[]"].split(',')))
-        except TypeError:
+        except (TypeError, ValueError):
             return make_response('IDs must be integers', 400)
-        SecurityResultsSAST.query.filter(
-            SecurityResultsSAST.project_id == project.id,
-            SecurityResultsSAST.id.in_(delete_ids)
-        ).delete()
-        SecurityResultsSAST.commit()
+        delete_results(project.id, delete_ids, self.module.cleanup_executor)
         return {"message": "deleted"}, 204
@@ -0,0 +1,45 @@
+from flask import request
+from flask_restful import Resource
+
+from pydantic import ValidationError
+
+from ...models.retention import SecurityRetentionPolicy
+from ...models.pd.retention import RetentionPolicyPD
+
+
+class API(Resource):
+    url_params = [
+        '<int:project_id>',
+    ]
+
+    def __init__(self, module):
+        self.module = module
+
+    def get(self, project_id: int):
+        project = self.module.context.rpc_manager.call.project_get_or_404(project_id=project_id)
+        policy = SecurityRetentionPolicy.query.filter(SecurityRetentionPolicy.project_id == project.id).first()
+        if not policy:
+            return RetentionPolicyPD(project_id=project.id, enabled=False).dict(), 200
+        return policy.to_json(), 200
+
+    def put(self, project_id: int):
+        project = self.module.context.rpc_manager.call.project_get_or_404(project_id=project_id)
+        try:
+            pd_obj = RetentionPolicyPD(**{**request.json, 'project_id': project.id})
+        except ValidationError as e:
+            return e.errors(), 400
+        policy = SecurityRetentionPolicy.query.filter(SecurityRetentionPolicy.project_id == project.id).first()
+        if policy:
+            for key, value in pd_obj.dict().items():
+                setattr(policy, key, value)
+            policy.commit()
+        else:
+            policy = SecurityRetentionPolicy(**pd_obj.dict())
+            policy.insert()
+        return policy.to_json(), 200
+
+    def post(self, project_id: int):
+        """ Queues a pass of the policy instead of waiting for scheduled one """
+        project = self.module.context.rpc_manager.call.project_get_or_404(project_id=project_id)
+        self.module.retention_scheduler.submit(project.id)
+        return {'message': 'queued'}, 202
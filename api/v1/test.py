@@ -5,6 +5,7 @@ from flask_restful import Resource
 from pylon.core.tools import log
 
 from ...utils import run_test, parse_test_data
+from ...scheduling import schedules_cache
 from ...models.tests import SecurityTestsSAST
 
 
@@ -37,6 +38,8 @@ class API(Resource):
         test = test_query.one()
 
         test.handle_change_schedules(schedules)
+        for i in schedules:
+            schedules_cache.pop(i.get('id'))
 
         if run_test_:
             resp = run_test(test)
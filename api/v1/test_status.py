@@ -40,11 +40,7 @@ class API(Resource):
         self.sio.emit("result_status_updated", {"status": test_status, 'result_id': test_id})
 
         if test_status['status'].lower().startswith('finished'):
-            test.update_severity_counts()
-            test.update_status_counts()
-            test.update_findings_counts()
-            test.commit()
-
+            # counters are maintained by ingestion, which recounts once the last queued payload is done
             write_test_run_logs_to_minio_bucket(test)
 
         return make_response({"message": f"Status for test_id={test_id} of project_id: {project_id} updated"}, 200)
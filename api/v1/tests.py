@@ -4,8 +4,10 @@ from pylon.core.tools import log
 from flask import request
 from sqlalchemy import and_
 from ...models.tests import SecurityTestsSAST
-from ...utils import parse_test_data, run_test
-from tools import api_tools
+from ...models.results import SecurityResultsSAST
+from ...utils import parse_test_data, run_test, ValidationErrorPD
+from ...pagination import get_listing
+from ...scheduling import load_schedules, schedules_cache
 
 
 class API(Resource):
@@ -17,20 +19,34 @@ class API(Resource):
         self.module = module
 
     def get(self, project_id: int):
-        total, res = api_tools.get(project_id, request.args, SecurityTestsSAST)
+        try:
+            total, res, next_cursor = get_listing(project_id, request.args, SecurityTestsSAST)
+        except ValidationErrorPD as e:
+            return e.dict(), 400
+        schedules, stale = load_schedules(
+            self.module.context.rpc_manager, (s for i in res for s in i.schedules or [])
+        )
+        with_last_run = request.args.get('last_run', '').lower() == 'true'
+        if with_last_run:
+            last_runs = SecurityResultsSAST.latest_by_test(i.id for i in res)
         rows = []
         for i in res:
             test = i.to_json()
-            schedules = test.pop('schedules', [])
-            if schedules:
-                try:
-                    test['scheduling'] = self.module.context.rpc_manager.timeout(
-                        2).scheduling_security_load_from_db_by_ids(schedules)
-                except Empty:
-                    ...
+            if with_last_run:
+                test['last_run'] = last_runs.get(i.id)
+            test_schedules = test.pop('schedules', None) or []
+            if test_schedules:
+                if not stale or all(s in schedules for s in test_schedules):
+                    test['scheduling'] = [schedules[s] for s in test_schedules if s in schedules]
+                else:
+                    # partial list would read as schedules removed, stale flag tells they are unknown
+                    test['scheduling_stale'] = True
             test['scanners'] = i.scanners
             rows.append(test)
-        return {"total": total, "rows": rows}, 200
+        response = {"total": total, "rows": rows, "scheduling_stale": stale}
+        if "cursor" in request.args:
+            response["next_cursor"] = next_cursor
+        return response, 200
 
     @staticmethod
     def get_schedules_ids(filter_) -> set:
@@ -53,12 +69,13 @@ class API(Resource):
             SecurityTestsSAST.id.in_(delete_ids)
         )
 
+        schedule_ids = self.get_schedules_ids(filter_)
         try:
-            self.module.context.rpc_manager.timeout(3).scheduling_delete_schedules(
-                self.get_schedules_ids(filter_)
-            )
+            self.module.context.rpc_manager.timeout(3).scheduling_delete_schedules(schedule_ids)
         except Empty:
             ...
+        for i in schedule_ids:
+            schedules_cache.pop(i)
 
         SecurityTestsSAST.query.filter(
             filter_
@@ -0,0 +1,60 @@
+from flask import request, make_response
+from flask_restful import Resource
+
+from ...models.reports import SecurityReport
+from ...models.results import SecurityResultsSAST
+from ...pagination import time_range_filter
+from ...downsampling import lttb, bucket_downsample
+
+TREND_COUNTERS = (*SecurityReport.SEVERITY_CHOICES.keys(), *SecurityReport.STATUS_CHOICES.keys(), 'findings')
+TREND_METHODS = ('lttb', 'bucket')
+DEFAULT_POINTS = 200
+MAX_POINTS = 2000
+
+
+class API(Resource):
+    url_params = [
+        '<int:project_id>/<string:test_uid>',
+    ]
+
+    def __init__(self, module):
+        self.module = module
+
+    def get(self, project_id: int, test_uid: str):
+        """ Counters history of a test downsampled to requested number of points """
+        args = request.args
+        points = min(args.get('points', DEFAULT_POINTS, type=int), MAX_POINTS)
+        method = args.get('method', 'lttb')
+        if method not in TREND_METHODS:
+            return make_response({"message": f"method must be one of {TREND_METHODS}"}, 400)
+        metric = args.get('metric', 'findings')
+        if metric not in TREND_COUNTERS:
+            return make_response({"message": f"metric must be one of {TREND_COUNTERS}"}, 400)
+
+        query = SecurityResultsSAST.query.with_entities(
+            SecurityResultsSAST.id, SecurityResultsSAST.start_date,
+            *(getattr(SecurityResultsSAST, i) for i in TREND_COUNTERS)
+        ).filter(
+            SecurityResultsSAST.project_id == project_id,
+            SecurityResultsSAST.test_uid == test_uid,
+        )
+        try:
+            time_range = time_range_filter(SecurityResultsSAST.start_date, args)
+        except ValueError as e:
+            return make_response({"message": str(e)}, 400)
+        if time_range is not None:
+            query = query.filter(time_range)
+        series = [
+            dict(row._mapping)
+            for row in query.order_by(SecurityResultsSAST.start_date, SecurityResultsSAST.id).all()
+        ]
+        total = len(series)
+
+        if method == 'lttb':
+            # metric shapes the sampled series, other counters follow selected runs
+            series = lttb(series, points, 'start_date', metric)
+        else:
+            series = bucket_downsample(series, points, TREND_COUNTERS)
+        for i in series:
+            i['start_date'] = i['start_date'].isoformat() if i['start_date'] else None
+        return {'total': total, 'method': method, 'rows': series}, 200
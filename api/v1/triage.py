@@ -0,0 +1,66 @@
+from collections import defaultdict
+
+from flask import request, make_response
+from flask_restful import Resource
+from sqlalchemy import func, select, update
+
+from tools import db
+
+from ...models.reports import SecurityReport
+from ...models.results import SecurityResultsSAST
+from ...models.triage import SecurityTriage
+
+
+class API(Resource):
+    url_params = [
+        '<int:project_id>',
+    ]
+
+    def __init__(self, module):
+        self.module = module
+
+    def put(self, project_id: int):
+        """ Applies status or severity to issues across all runs of the project or of chosen tests """
+        args = request.json
+        issue_hashes = set(args.get('issue_hashes') or [])
+        if not issue_hashes:
+            return make_response({"message": "No issues provided"}, 400)
+
+        if args.get("severity"):
+            field, choices = "severity", SecurityReport.SEVERITY_CHOICES
+        elif args.get("status"):
+            field, choices = "status", SecurityReport.STATUS_CHOICES
+        else:
+            return make_response({"message": "Action is invalid"}, 400)
+        value = args[field].replace(" ", "_").lower()
+        if value not in choices:
+            return make_response({"message": f"Invalid {field} {args[field]}"}, 400)
+
+        column = getattr(SecurityReport, field)
+        filter_ = [
+            SecurityReport.project_id == project_id,
+            SecurityReport.issue_hash.in_(issue_hashes),
+            column != value,
+        ]
+        if args.get("test_uids"):
+            filter_.append(SecurityReport.report_id.in_(
+                select(SecurityResultsSAST.id).where(
+                    SecurityResultsSAST.project_id == project_id,
+                    SecurityResultsSAST.test_uid.in_(args["test_uids"]),
+                )
+            ))
+
+        counts_delta = defaultdict(lambda: defaultdict(int))
+        for report_id, old_value, count in db.session.query(
+            SecurityReport.report_id, column, func.count(SecurityReport.id)
+        ).filter(*filter_).group_by(SecurityReport.report_id, column):
+            counts_delta[report_id][old_value.lower()] -= count
+            counts_delta[report_id][value] += count
+
+        updated = db.session.execute(
+            update(SecurityReport.__table__).where(*filter_).values({field: value})
+        ).rowcount
+        SecurityTriage.upsert(project_id, issue_hashes, **{field: value})
+        SecurityResultsSAST.apply_counts_delta(counts_delta)
+        SecurityReport.commit()
+        return {"updated": updated, "result_ids": sorted(counts_delta)}, 200
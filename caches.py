@@ -0,0 +1,129 @@
+import threading
+from queue import Empty
+from time import monotonic
+from typing import Iterable
+
+from tools import secrets_tools
+
+
+class TTLCache:
+    """ Thread safe mapping which entries expire ttl seconds after being set, expired ones are kept as stale """
+
+    def __init__(self, ttl: float, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = dict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None, stale: bool = False):
+        """ :param stale: return expired value instead of default """
+        with self._lock:
+            item = self._data.get(key)
+        if item is None or (not stale and item[1] < monotonic()):
+            return default
+        return item[0]
+
+    def set(self, key, value, ttl: float = None) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            if len(self._data) >= self.max_size:
+                now = monotonic()
+                self._data = {k: v for k, v in self._data.items() if v[1] >= now}
+                while len(self._data) >= self.max_size:
+                    self._data.pop(next(iter(self._data)))
+            self._data[key] = (value, monotonic() + (self.ttl if ttl is None else ttl))
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class MissingRpcRegistry:
+    """
+    Remembers rpc functions nobody answered several times in a row, calls to them fail fast
+    until ttl expires or until providing plugin reports them with forget
+
+    A single timeout is not enough, it may be a registered handler that was slow once
+    """
+
+    def __init__(self, ttl: float = 60, misses: int = 3):
+        self.misses = misses
+        self._missing = TTLCache(ttl=ttl)
+        self._misses = TTLCache(ttl=ttl)
+        self._lock = threading.Lock()
+
+    def is_missing(self, func: str) -> bool:
+        return self._missing.get(func, False)
+
+    def call(self, rpc, func: str, timeout: float, **kwargs):
+        """ rpc.call_function_with_timeout raising Empty right away for known missing functions """
+        if self.is_missing(func):
+            raise Empty
+        try:
+            result = rpc.call_function_with_timeout(func=func, timeout=timeout, **kwargs)
+        except Empty:
+            with self._lock:
+                misses = self._misses.get(func, 0) + 1
+                if misses >= self.misses:
+                    self._misses.pop(func)
+                    self._missing.set(func, True)
+                else:
+                    self._misses.set(func, misses)
+            raise
+        self._misses.pop(func)
+        return result
+
+    def forget(self, funcs: Iterable[str] = None) -> None:
+        """ Drops given or all functions, e.g. when plugin providing them is registered """
+        if funcs is None:
+            self._missing.clear()
+            self._misses.clear()
+            return
+        for i in funcs:
+            self._missing.pop(i)
+            self._misses.pop(i)
+
+
+missing_rpcs = MissingRpcRegistry()
+
+
+class ProjectSecretsCache:
+    """
+    Secrets of a project fetched once per ttl, so that building a config resolves
+    all of its placeholders with a single secrets lookup
+    """
+
+    def __init__(self, ttl: float = 30):
+        self._secrets = TTLCache(ttl=ttl)
+
+    def get(self, project_id: int) -> dict:
+        secrets = self._secrets.get(project_id)
+        if secrets is None:
+            secrets = secrets_tools.get_project_secrets(project_id)
+            for key, value in secrets_tools.get_project_hidden_secrets(project_id).items():
+                secrets.setdefault(key, value)
+            self._secrets.set(project_id, secrets)
+        return secrets
+
+    def unsecret(self, value, project_id: int):
+        return secrets_tools.unsecret(value, secrets=self.get(project_id), project_id=project_id)
+
+    def invalidate(self, project_id: int = None) -> None:
+        if project_id is None:
+            self._secrets.clear()
+        else:
+            self._secrets.pop(project_id)
+
+
+project_secrets = ProjectSecretsCache()
+
+# integrations plugin settings by (project id, integration id), part of config_version
+integration_settings = TTLCache(ttl=30)
+
+# rendered dusty configs by SecurityTestsSAST.config_version
+execution_configs = TTLCache(ttl=300, max_size=1000)
@@ -0,0 +1,127 @@
+from sqlalchemy import delete, exists, func, select
+
+from pylon.core.tools import log
+
+from .models.results import SecurityResultsSAST
+from .models.details import SecurityDetails
+from .models.reports import SecurityReport
+from .models.overview import SecurityOverview
+from .models.snapshots import SecurityTestSnapshot
+from tools import rpc_tools, db, MinioClient
+
+
+CLEANUP_BATCH_SIZE = 10000
+
+
+def delete_in_batches(model, *filter_, batch_size: int = CLEANUP_BATCH_SIZE, skip_locked: bool = False) -> int:
+    """
+    Set based DELETE of matching rows, committing every batch_size rows
+
+    :param skip_locked: leave rows locked by other transactions in place
+    """
+    deleted = 0
+    while True:
+        batch = select(model.id).where(*filter_).limit(batch_size)
+        if skip_locked:
+            batch = batch.with_for_update(skip_locked=True)
+        count = db.session.execute(
+            delete(model.__table__).where(model.__table__.c.id.in_(batch.scalar_subquery()))
+        ).rowcount
+        db.session.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def delete_orphaned_details(project_id: int = None) -> int:
+    """
+    Deletes details no finding refers to, of all projects if project_id is not set
+
+    Details ingestion is about to reuse are locked by resolve_details_ids and skipped
+    """
+    filter_ = [~exists().where(SecurityReport.details == SecurityDetails.id)]
+    if project_id is not None:
+        filter_.append(SecurityDetails.project_id == project_id)
+    return delete_in_batches(SecurityDetails, *filter_, skip_locked=True)
+
+
+def delete_orphaned_findings(batch_size: int = CLEANUP_BATCH_SIZE) -> None:
+    """
+    Finishes cleanups of deleted results lost with the process, findings first and then details
+
+    Findings are checked in primary key ranges of batch_size ids, each range committed on its own
+    """
+    try:
+        findings, last_id = 0, 0
+        max_id = db.session.query(func.max(SecurityReport.id)).scalar() or 0
+        table = SecurityReport.__table__
+        while last_id < max_id:
+            findings += db.session.execute(delete(table).where(
+                table.c.id > last_id,
+                table.c.id <= last_id + batch_size,
+                ~exists().where(SecurityResultsSAST.id == table.c.report_id),
+            )).rowcount
+            db.session.commit()
+            last_id += batch_size
+        details = delete_orphaned_details()
+        snapshots = delete_unreferenced_snapshots()
+        if findings or details or snapshots:
+            log.info('Removed %s findings, %s details and %s test snapshots of deleted results',
+                     findings, details, snapshots)
+    except Exception:
+        log.exception('Cleanup of orphaned findings failed')
+        db.session.rollback()
+
+
+def delete_unreferenced_snapshots() -> int:
+    deleted = SecurityTestSnapshot.delete_unreferenced(SecurityResultsSAST.test_snapshot)
+    db.session.commit()
+    return deleted
+
+
+def cleanup_deleted_results(project_id: int, result_ids: list) -> None:
+    """ Removes findings, buckets and orphaned details left by deleted results """
+    try:
+        findings = delete_in_batches(SecurityReport, SecurityReport.report_id.in_(result_ids))
+        details = delete_orphaned_details(project_id)
+        snapshots = delete_unreferenced_snapshots()
+        log.info('Deleted results %s of project %s: removed %s findings, %s details and %s test snapshots',
+                 result_ids, project_id, findings, details, snapshots)
+        minio_client = MinioClient(rpc_tools.RpcMixin().rpc.call.project_get_or_404(project_id))
+        for result_id in result_ids:
+            try:
+                minio_client.remove_bucket(f'run--{result_id}')
+            except Exception as e:
+                log.warning('Cannot remove bucket of result %s: %s', result_id, e)
+    except Exception:
+        log.exception('Cleanup of deleted results %s failed', result_ids)
+    finally:
+        db.session.remove()
+
+
+def delete_results(project_id: int, result_ids: list, executor) -> list:
+    """
+    Deletes results right away and leaves their findings, buckets and details to background cleanup
+
+    :param executor: concurrent.futures executor running the cleanup
+    :return: ids of deleted results
+    """
+    query = SecurityResultsSAST.query.filter(
+        SecurityResultsSAST.project_id == project_id,
+        SecurityResultsSAST.id.in_(result_ids),
+    )
+    counters = [i for i in SecurityOverview.COUNTERS if i != 'runs']
+    rows = query.with_entities(
+        SecurityResultsSAST.id, SecurityResultsSAST.start_date,
+        *(getattr(SecurityResultsSAST, i) for i in counters)
+    ).all()
+    deleted = [i for i, *_ in rows]
+    if deleted:
+        query.delete(synchronize_session=False)
+        SecurityOverview.apply_deltas(
+            (project_id, start_date, {**{k: -(v or 0) for k, v in zip(counters, counts)}, 'runs': -1})
+            for _, start_date, *counts in rows
+        )
+        SecurityResultsSAST.commit()
+        executor.submit(cleanup_deleted_results, project_id, deleted)
+    return deleted
@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Iterable
+
+
+def lttb(points: list, threshold: int, x_key: str, y_key: str) -> list:
+    """
+    Largest-Triangle-Three-Buckets downsampling, keeps threshold of the points shaping the series most
+
+    :param points: dicts ordered by x_key, numeric values or datetimes
+    """
+    if threshold >= len(points) or threshold < 3:
+        return points[:max(threshold, 0)] if threshold < 3 else points
+
+    def coords(point):
+        x = point[x_key]
+        return (x.timestamp() if isinstance(x, datetime) else x), point[y_key] or 0
+
+    sampled = [points[0]]
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start, end = int(i * bucket_size) + 1, int((i + 1) * bucket_size) + 1
+        next_bucket = points[end:min(int((i + 2) * bucket_size) + 1, len(points))] or points[-1:]
+        avg_x = sum(coords(p)[0] for p in next_bucket) / len(next_bucket)
+        avg_y = sum(coords(p)[1] for p in next_bucket) / len(next_bucket)
+        ax, ay = coords(points[a])
+        best, best_area = start, -1
+        for j in range(start, end):
+            x, y = coords(points[j])
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def bucket_downsample(points: list, threshold: int, keys: Iterable[str]) -> list:
+    """
+    Splits points into threshold runs of consecutive points, averaging keys of each one
+
+    Every bucket is represented by its first point with runs set to its size
+    """
+    if threshold <= 0:
+        return []
+    size = max(len(points) / threshold, 1)
+    sampled = []
+    for i in range(min(threshold, len(points))):
+        bucket = points[int(i * size):int((i + 1) * size)]
+        if not bucket:
+            continue
+        item = {**bucket[0], 'runs': len(bucket)}
+        for key in keys:
+            item[key] = round(sum(p[key] or 0 for p in bucket) / len(bucket), 2)
+        sampled.append(item)
+    return sampled
@@ -0,0 +1,39 @@
+from itertools import islice
+from typing import Iterator
+
+from .models.details import SecurityDetails
+from .models.reports import SecurityReport
+from .serializers.columnar import findings_serializer
+from tools import db
+
+
+EXPORT_BATCH_SIZE = 1000
+
+
+def iter_findings(project_id: int, report_id: int, columns: list,
+                  order_by: tuple = (), batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[list]:
+    """
+    Streams findings of a result with a server side cursor
+
+    :param columns: findings_serializer column names, details id column is always selected
+    :param order_by: sort rules, id is used as last one
+    :return: yields batches of serialized findings with their details text
+    """
+    columns = [i for i in columns if i != 'details'] + ['details']
+    rows = db.session.query(*findings_serializer.entities(columns)).filter(
+        SecurityReport.project_id == project_id,
+        SecurityReport.report_id == report_id,
+    ).order_by(*order_by, SecurityReport.id).yield_per(batch_size)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        findings = findings_serializer.dump(columns, batch)
+        details = dict(
+            db.session.query(SecurityDetails.id, SecurityDetails.details).filter(
+                SecurityDetails.id.in_({i['details_id'] for i in findings}),
+            ).all()
+        )
+        for i in findings:
+            i['details'] = details.get(i['details_id'])
+        yield findings
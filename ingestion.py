@@ -0,0 +1,311 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from io import BytesIO
+from itertools import islice
+from queue import Queue
+from typing import Iterable, Iterator
+
+from sqlalchemy import insert
+
+from pylon.core.tools import log
+
+from .models.results import SecurityResultsSAST
+from .models.details import SecurityDetails
+from .models.reports import SecurityReport
+from .models.triage import SecurityTriage
+from .models.ingestion_jobs import SecurityIngestionJob
+from .utils import ValidationErrorPD
+from tools import db
+
+
+INGEST_CHUNK_SIZE = 1000
+UPLOAD_TIMEOUT = timedelta(days=1)
+
+
+def format_endpoints(endpoints: list) -> str:
+    entrypoints = ""
+    for endpoint in endpoints:
+        if isinstance(endpoint, list):
+            entrypoints += "<br />".join(endpoint)
+        else:
+            entrypoints += f"<br />{endpoint}"
+    return entrypoints
+
+
+def resolve_details_ids(project_id: int, details: dict) -> dict:
+    """
+    Maps details md5 hashes to SecurityDetails ids, inserting the missing ones
+
+    :param project_id: Project id
+    :param details: {detail_hash: details text}
+    :return: {detail_hash: details id}
+    """
+    if not details:
+        return dict()
+    # shared lock keeps reused details from delete_orphaned_details until findings are committed
+    ids = dict(
+        db.session.query(SecurityDetails.detail_hash, SecurityDetails.id).filter(
+            SecurityDetails.project_id == project_id,
+            SecurityDetails.detail_hash.in_(details.keys()),
+        ).with_for_update(read=True).all()
+    )
+    missing = [
+        {'project_id': project_id, 'detail_hash': k, 'details': v}
+        for k, v in details.items() if k not in ids
+    ]
+    if missing:
+        inserted = db.session.execute(
+            insert(SecurityDetails.__table__).values(missing).returning(
+                SecurityDetails.__table__.c.detail_hash, SecurityDetails.__table__.c.id
+            )
+        )
+        ids.update(dict(inserted.all()))
+    return ids
+
+
+def stage_findings(project_id: int, findings: list) -> int:
+    """
+    Adds findings sent by dusty reporter to the session with a constant number of statements,
+    commit is up to caller
+
+    :param project_id: Project id
+    :param findings: list of findings, each one carrying its report_id
+    :return: number of staged findings
+    """
+    if not findings:
+        return 0
+    details = dict()
+    for finding in findings:
+        md5 = hashlib.md5(finding["details"].encode("utf-8")).hexdigest()
+        details[md5] = finding["details"]
+        finding["details"] = md5
+        finding["project_id"] = project_id
+        finding["endpoints"] = format_endpoints(finding.get("endpoints", []))
+
+    details_ids = resolve_details_ids(project_id, details)
+    triage = SecurityTriage.get_index(project_id, {i["issue_hash"] for i in findings})
+
+    columns = [c.name for c in SecurityReport.__table__.columns if c.name != 'id']
+    rows = []
+    counts_delta = defaultdict(lambda: defaultdict(int))
+    for finding in findings:
+        finding["details"] = details_ids[finding["details"]]
+        status, severity = triage.get(finding["issue_hash"], (None, None))
+        if severity:
+            finding["severity"] = severity
+        if not (finding.get("false_positive") == 1 or finding.get("excluded_finding") == 1):
+            finding["status"] = status or "Not_defined"
+            for k in ['false_positive', 'excluded_finding', 'info_finding']:
+                finding.pop(k, None)
+        finding.setdefault("status", "Not_defined")
+        rows.append({k: finding.get(k) for k in columns})
+        delta = counts_delta[finding["report_id"]]
+        delta[finding["severity"].lower()] += 1
+        delta[finding["status"].lower()] += 1
+        delta["findings"] += 1
+
+    db.session.execute(insert(SecurityReport.__table__), rows)
+    SecurityResultsSAST.apply_counts_delta(counts_delta)
+    return len(rows)
+
+
+def ingest_findings(project_id: int, findings: list) -> int:
+    """ Stores findings sent by dusty reporter, see stage_findings """
+    count = stage_findings(project_id, findings)
+    db.session.commit()
+    return count
+
+
+def iter_ndjson(lines: Iterable[bytes]) -> Iterator[dict]:
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise ValidationErrorPD(['body', line_number], f'Invalid json: {e}')
+
+
+def ingest_findings_stream(project_id: int, findings: Iterable[dict],
+                           chunk_size: int = INGEST_CHUNK_SIZE) -> Iterator[int]:
+    """
+    Ingests findings from an iterable committing every chunk_size findings
+
+    :param project_id: Project id
+    :param findings: iterable of findings, e.g. parsed ndjson lines
+    :param chunk_size: max number of findings held in memory and committed at once
+    :return: yields number of findings stored by each chunk
+    """
+    for chunk in iter_chunks(findings, chunk_size):
+        yield ingest_findings(project_id, chunk)
+
+
+def iter_chunks(items: Iterable, size: int) -> Iterator[list]:
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def store_ingestion_payload(job: SecurityIngestionJob, result: SecurityResultsSAST,
+                            findings: Iterable[dict]) -> int:
+    """
+    Uploads findings to result bucket as gzipped ndjson parts of INGEST_CHUNK_SIZE findings,
+    so that workers hold a single part in memory. Commit is up to caller
+
+    :return: number of stored parts
+    """
+    minio_client = result.get_minio_client()
+    job.parts = 0
+    for chunk in iter_chunks(findings, INGEST_CHUNK_SIZE):
+        part = BytesIO()
+        with gzip.GzipFile(fileobj=part, mode='wb') as compressed:
+            for finding in chunk:
+                compressed.write(json.dumps(finding).encode('utf-8'))
+                compressed.write(b'\n')
+        part.seek(0)
+        minio_client.upload_file(result.bucket_name, part, job.part_name(job.parts))
+        job.parts += 1
+    return job.parts
+
+
+def remove_ingestion_payload(job: SecurityIngestionJob, result: SecurityResultsSAST) -> None:
+    minio_client = result.get_minio_client()
+    for index in range(job.parts or 0):
+        try:
+            minio_client.remove_file(result.bucket_name, job.part_name(index))
+        except Exception as e:
+            log.warning('Cannot remove findings payload part %s of job %s: %s', index, job.id, e)
+
+
+def process_ingestion_job(job_id: int) -> bool:
+    """
+    Ingests findings payload stored in result bucket by POST /findings?mode=async
+
+    Every part is committed with the job progress, so a resumed or retried job starts from its first
+    part not stored yet
+
+    :param job_id: SecurityIngestionJob id
+    :return: True if the job failed and is left pending for another attempt
+    """
+    job = SecurityIngestionJob.query.get(job_id)
+    if not job or job.status in (SecurityIngestionJob.DONE, SecurityIngestionJob.FAILED):
+        return False
+    job.status = SecurityIngestionJob.RUNNING
+    job.commit()
+    try:
+        result = SecurityResultsSAST.query.get(job.report_id)
+        minio_client = result.get_minio_client()
+        for index in range(job.chunks or 0, job.parts or 0):
+            payload = gzip.decompress(minio_client.download_file(result.bucket_name, job.part_name(index)))
+            count = stage_findings(job.project_id, list(iter_ndjson(payload.splitlines())))
+            job.ingested = (job.ingested or 0) + count
+            job.chunks = index + 1
+            db.session.commit()
+        job.status = SecurityIngestionJob.DONE
+        job.commit()
+        remove_ingestion_payload(job, result)
+    except Exception as e:
+        log.exception('Findings ingestion job %s failed', job_id)
+        db.session.rollback()
+        job.attempts = (job.attempts or 0) + 1
+        job.error = str(e)
+        if job.attempts < SecurityIngestionJob.MAX_ATTEMPTS:
+            job.status = SecurityIngestionJob.PENDING
+            job.commit()
+            return True
+        job.status = SecurityIngestionJob.FAILED
+        job.commit()
+    refresh_report_counts(job.report_id)
+    return False
+
+
+def refresh_report_counts(report_id: int) -> None:
+    """ Recounts the result once its last queued findings payload is processed """
+    pending = SecurityIngestionJob.query.filter(
+        SecurityIngestionJob.report_id == report_id,
+        SecurityIngestionJob.unfinished_filter(),
+    ).count()
+    if not pending:
+        SecurityResultsSAST.refresh_counts({report_id})
+
+
+class FindingsIngestionQueue:
+    """ Pool of background workers ingesting queued findings, bounded per project """
+
+    def __init__(self, workers: int = 4, jobs_per_project: int = 1):
+        self.workers = workers
+        self.jobs_per_project = jobs_per_project
+        self._queue = Queue()
+        self._lock = threading.Lock()
+        self._running = defaultdict(int)
+        self._deferred = defaultdict(deque)
+        self._threads = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f'security_sast_ingestion_{i}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+        self._threads = []
+
+    def submit(self, job: SecurityIngestionJob) -> None:
+        with self._lock:
+            if self._running[job.project_id] >= self.jobs_per_project:
+                self._deferred[job.project_id].append(job.id)
+                return
+            self._running[job.project_id] += 1
+        self._queue.put((job.project_id, job.id))
+
+    def resume(self) -> None:
+        """ Re-queues jobs left unfinished by previous process """
+        # payload of a job still uploading after a day is never going to be complete
+        SecurityIngestionJob.query.filter(
+            SecurityIngestionJob.status == SecurityIngestionJob.UPLOADING,
+            SecurityIngestionJob.updated_at < datetime.utcnow() - UPLOAD_TIMEOUT,
+        ).update({
+            SecurityIngestionJob.status: SecurityIngestionJob.FAILED,
+            SecurityIngestionJob.error: 'Payload upload was interrupted',
+        }, synchronize_session=False)
+        db.session.commit()
+        jobs = SecurityIngestionJob.query.filter(
+            SecurityIngestionJob.pending_filter()
+        ).order_by(SecurityIngestionJob.id).all()
+        for job in jobs:
+            self.submit(job)
+        db.session.remove()
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            project_id, job_id = item
+            retry = False
+            try:
+                retry = process_ingestion_job(job_id)
+            except Exception:
+                log.exception('Findings ingestion worker failed on job %s', job_id)
+            finally:
+                db.session.remove()
+                with self._lock:
+                    if retry:
+                        # failed job goes after other queued jobs of the project
+                        self._deferred[project_id].append(job_id)
+                    if self._deferred[project_id]:
+                        self._queue.put((project_id, self._deferred[project_id].popleft()))
+                    else:
+                        self._running[project_id] -= 1
@@ -1,3 +1,7 @@
+from sqlalchemy import inspect
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateColumn
+from pylon.core.tools import log  # pylint: disable=E0611,E0401
 from tools import db
 
 
@@ -7,5 +11,56 @@ def init_db():
     from .models.thresholds import SecurityThresholds
     from .models.details import SecurityDetails
     from .models.reports import SecurityReport
+    from .models.triage import SecurityTriage
+    from .models.ingestion_jobs import SecurityIngestionJob
+    from .models.retention import SecurityRetentionPolicy
+    from .models.overview import SecurityOverview
+    from .models.snapshots import SecurityTestSnapshot
+    triage_exists = inspect(db.engine).has_table(SecurityTriage.__tablename__)
+    overview_exists = inspect(db.engine).has_table(SecurityOverview.__tablename__)
     db.Base.metadata.create_all(bind=db.engine)
+    add_missing_columns(SecurityResultsSAST)
+    add_missing_columns(SecurityTestSnapshot)
+    add_missing_columns(SecurityIngestionJob)
+    with db.engine.begin() as connection:
+        # new results keep test_snapshot reference instead of test copy
+        connection.exec_driver_sql(
+            f'ALTER TABLE {SecurityResultsSAST.__tablename__} ALTER COLUMN test_config DROP NOT NULL'
+        )
+    # create_all skips indexes added to already existing tables
+    for model in (SecurityResultsSAST, SecurityReport):
+        for index in model.__table__.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+    if not triage_exists:
+        SecurityTriage.backfill()
+    if not overview_exists:
+        SecurityResultsSAST.rebuild_overview()
+    create_search_indexes()
 
+
+def add_missing_columns(model):
+    """ Adds nullable columns introduced to an already existing table, without rewriting it """
+    existing = {i['name'] for i in inspect(db.engine).get_columns(model.__tablename__)}
+    with db.engine.begin() as connection:
+        for column in model.__table__.columns:
+            if column.name not in existing:
+                connection.exec_driver_sql(
+                    f'ALTER TABLE {model.__tablename__} '
+                    f'ADD COLUMN {CreateColumn(column).compile(dialect=db.engine.dialect)}'
+                )
+
+
+def create_search_indexes():
+    from .models.search import is_postgres, search_indexes, trigram_indexes
+    if not is_postgres():
+        return
+    for index in search_indexes():
+        index.create(bind=db.engine, checkfirst=True)
+    try:
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DBAPIError as e:
+        log.warning('pg_trgm is not available, results search is not indexed: %s', e)
+        return
+    for index in trigram_indexes():
+        index.create(bind=db.engine, checkfirst=True)
@@ -0,0 +1,46 @@
+from datetime import datetime as dt
+
+from sqlalchemy import String, Column, Integer, Text, DateTime, Index
+from tools import db_tools, db
+
+
+class SecurityIngestionJob(db_tools.AbstractBaseMixin, db.Base):
+    """ Findings payload queued for background ingestion """
+    __tablename__ = "security_sast_ingestion_jobs"
+    __table_args__ = (
+        Index('security_sast_ingestion_jobs_report_idx', 'report_id', 'status'),
+    )
+
+    UPLOADING = 'uploading'
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    MAX_ATTEMPTS = 3
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, unique=False, nullable=False)
+    report_id = Column(Integer, unique=False, nullable=False)
+    content_type = Column(String(64), unique=False, nullable=False)
+    status = Column(String(16), unique=False, default=PENDING)
+    ingested = Column(Integer, unique=False, default=0)
+    chunks = Column(Integer, unique=False, default=0)
+    # payload is stored as parts of INGEST_CHUNK_SIZE findings, one chunk each
+    parts = Column(Integer, unique=False, default=0)
+    attempts = Column(Integer, unique=False, default=0)
+    error = Column(Text, unique=False, nullable=True)
+    created_at = Column(DateTime, default=dt.utcnow)
+    updated_at = Column(DateTime, default=dt.utcnow, onupdate=dt.utcnow)
+
+    def part_name(self, index: int) -> str:
+        return f'findings_{self.id}_{index:05d}.jsonl.gz'
+
+    @classmethod
+    def pending_filter(cls):
+        return cls.status.in_((cls.PENDING, cls.RUNNING))
+
+    @classmethod
+    def unfinished_filter(cls):
+        """ pending_filter including jobs which payload is still being uploaded """
+        return cls.status.in_((cls.UPLOADING, cls.PENDING, cls.RUNNING))
+
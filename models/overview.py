@@ -0,0 +1,113 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Iterable
+
+from sqlalchemy import Column, Integer, String, Date, UniqueConstraint, func
+from sqlalchemy.dialects.postgresql import insert
+
+from tools import db_tools, db
+
+from .reports import SecurityReport
+
+
+class SecurityOverview(db_tools.AbstractBaseMixin, db.Base):
+    """
+    Per project counters summed over all results, kept up to date by result counters changes
+
+    Every project has one TOTAL row and a DAY row per start date of its results
+    """
+    __tablename__ = "security_sast_overview"
+    __table_args__ = (
+        UniqueConstraint('project_id', 'period', 'bucket'),
+    )
+
+    TOTAL = 'total'
+    DAY = 'day'
+    TOTAL_BUCKET = date(1970, 1, 1)
+    PERIODS = ('day', 'week', 'month')
+    COUNTERS = (*SecurityReport.SEVERITY_CHOICES.keys(), *SecurityReport.STATUS_CHOICES.keys(), 'findings', 'runs')
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, unique=False, nullable=False)
+    period = Column(String(8), unique=False, nullable=False)
+    bucket = Column(Date, unique=False, nullable=False)
+
+    @staticmethod
+    def bucket_of(value) -> date:
+        value = value or datetime.utcnow()
+        return value.date() if isinstance(value, datetime) else value
+
+    @classmethod
+    def apply_deltas(cls, deltas: Iterable[tuple]) -> None:
+        """
+        Shifts total and day counters, commit is up to caller
+
+        :param deltas: (project_id, result start_date, {counter name: delta}) tuples
+        """
+        rows = defaultdict(lambda: dict.fromkeys(cls.COUNTERS, 0))
+        for project_id, start_date, delta in deltas:
+            for key in ((project_id, cls.TOTAL, cls.TOTAL_BUCKET), (project_id, cls.DAY, cls.bucket_of(start_date))):
+                for k, v in delta.items():
+                    rows[key][k] += v or 0
+        cls.shift(rows)
+
+    @classmethod
+    def shift(cls, rows: dict) -> None:
+        """
+        Adds deltas to counters rows, creating missing ones, commit is up to caller
+
+        :param rows: {(project_id, period, bucket): {counter name: delta}}
+        """
+        rows = [
+            {'project_id': project_id, 'period': period, 'bucket': bucket, **counters}
+            for (project_id, period, bucket), counters in rows.items()
+            if any(counters.values())
+        ]
+        if not rows:
+            return
+        stmt = insert(cls.__table__).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.project_id, cls.period, cls.bucket],
+            set_={k: cls.__table__.c[k] + stmt.excluded[k] for k in cls.COUNTERS}
+        )
+        db.session.execute(stmt)
+
+    @classmethod
+    def get_total(cls, project_id: int) -> dict:
+        row = db.session.query(*(getattr(cls, i) for i in cls.COUNTERS)).filter(
+            cls.project_id == project_id,
+            cls.period == cls.TOTAL,
+            cls.bucket == cls.TOTAL_BUCKET,
+        ).first()
+        return dict(zip(cls.COUNTERS, row)) if row else dict.fromkeys(cls.COUNTERS, 0)
+
+    @classmethod
+    def get_series(cls, project_id: int, period: str = 'day', time_range=None) -> list:
+        """
+        Counters bucketed by day, week or month of results start date
+
+        :param time_range: additional clause on bucket column
+        """
+        if period not in cls.PERIODS:
+            raise ValueError(f'period must be one of {cls.PERIODS}')
+        if period == cls.DAY:
+            bucket = cls.bucket
+        else:
+            bucket = func.date_trunc(period, cls.bucket).cast(Date)
+        query = db.session.query(
+            bucket.label('bucket'), *(func.sum(getattr(cls, i)).label(i) for i in cls.COUNTERS)
+        ).filter(
+            cls.project_id == project_id,
+            cls.period == cls.DAY,
+        )
+        if time_range is not None:
+            query = query.filter(time_range)
+        return [
+            {'bucket': row.bucket.isoformat(), **{i: int(getattr(row, i) or 0) for i in cls.COUNTERS}}
+            for row in query.group_by(bucket).order_by(bucket).all()
+        ]
+
+
+
+for i in SecurityOverview.COUNTERS:
+    setattr(SecurityOverview, i, Column(Integer, unique=False, nullable=False, default=0))
@@ -0,0 +1,10 @@
+from typing import Optional
+
+from pydantic import BaseModel, conint
+
+
+class RetentionPolicyPD(BaseModel):
+    project_id: int
+    keep_runs: Optional[conint(ge=1)]
+    keep_days: Optional[conint(ge=1)]
+    enabled: bool = True
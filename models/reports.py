@@ -1,4 +1,5 @@
-from sqlalchemy import String, Column, Integer, Text
+from sqlalchemy import String, Column, Integer, Text, Index, exists
+from sqlalchemy.orm import aliased
 from tools import db_tools, db
 
 import sqlalchemy.types as types
@@ -11,16 +12,22 @@ class ChoiceType(types.TypeDecorator):
 
     def __init__(self, choices: dict, **kwargs):
         self.choices = dict(choices)
+        # stored value -> choice key, choice keys take precedence as before
+        self.reverse_choices = {v.lower(): k for k, v in self.choices.items()}
+        self.result_choices = {**self.reverse_choices, **self.choices}
+        # accepts both choice keys and already stored values
+        self.bind_choices = {**{v.lower(): v for v in self.choices.values()}, **self.choices}
         super().__init__(**kwargs)
 
     def process_bind_param(self, value: str, dialect):
-        return self.choices[value.lower()]
+        if value is None:
+            return None
+        return self.bind_choices[value.lower()]
 
     def process_result_value(self, value: str, dialect):
-        try:
-            return self.choices[value.lower()]
-        except KeyError:
-            return [k for k, v in self.choices.items() if v.lower() == value.lower()][0]
+        if value is None:
+            return None
+        return self.result_choices[value.lower()]
 
 
 class SecurityReport(db_tools.AbstractBaseMixin, db.Base):
@@ -38,8 +45,14 @@ class SecurityReport(db_tools.AbstractBaseMixin, db.Base):
         'ignored': 'ignored',
         'not_defined': 'not defined'
     }
+    CURSOR_SORT_KEYS = ('id', 'tool_name', 'description', 'severity', 'status')
 
     __tablename__ = "security_sast_report"
+    __table_args__ = (
+        Index('security_sast_report_report_id_idx', 'report_id', 'id'),
+        Index('security_sast_report_issue_hash_idx', 'report_id', 'issue_hash'),
+        Index('security_sast_report_details_idx', 'details'),
+    )
 
     id = Column(Integer, primary_key=True)
     project_id = Column(Integer, unique=False, nullable=False)
@@ -61,4 +74,21 @@ class SecurityReport(db_tools.AbstractBaseMixin, db.Base):
         result = super().to_json()
         for col in ('status', 'severity'):
             result[col] = result[col].replace('_', ' ')
-        return result
\ No newline at end of file
+        return result
+
+    @classmethod
+    def diff_filters(cls, report_id: int, base_report_id: int) -> dict:
+        """
+        Filters selecting new, fixed and persistent findings of report_id compared to base_report_id.
+        new and persistent select rows of report_id, fixed - rows of base_report_id
+        """
+        other = aliased(cls)
+
+        def in_report(id_: int):
+            return exists().where(other.report_id == id_, other.issue_hash == cls.issue_hash)
+
+        return {
+            'new': (cls.report_id == report_id, ~in_report(base_report_id)),
+            'fixed': (cls.report_id == base_report_id, ~in_report(report_id)),
+            'persistent': (cls.report_id == report_id, in_report(base_report_id)),
+        }
@@ -1,7 +1,9 @@
 import string
+from collections import defaultdict
 from datetime import datetime as dt, timedelta
+from typing import Iterable
 
-from sqlalchemy import String, Column, Integer, JSON, DateTime, ARRAY, func
+from sqlalchemy import String, Column, Integer, JSON, DateTime, ARRAY, Float, Index, func, literal, select, union_all
 
 from .reports import SecurityReport
 # from ...shared.db_manager import Base
@@ -11,12 +13,24 @@ from .reports import SecurityReport
 # from ...shared.connectors.minio import MinioClient
 
 from tools import db_tools, db, rpc_tools, MinioClient, api_tools
+from pylon.core.tools import log  # pylint: disable=E0611,E0401
 
 from .tests import SecurityTestsSAST
+from .overview import SecurityOverview
+from .snapshots import SecurityTestSnapshot, TestSnapshot
 
 
 class SecurityResultsSAST(db_tools.AbstractBaseMixin, db.Base, rpc_tools.RpcMixin):
     __tablename__ = "security_results_sast"
+    __table_args__ = (
+        Index('security_results_sast_project_id_idx', 'project_id', 'id'),
+        Index('security_results_sast_start_date_idx', 'project_id', 'start_date'),
+        Index('security_results_sast_scanned_at_idx', 'project_id', 'scanned_at'),
+        Index('security_results_sast_test_uid_idx', 'project_id', 'test_uid', 'start_date'),
+    )
+    CURSOR_SORT_KEYS = ('id', 'start_date', 'test_name', 'findings', *SecurityReport.SEVERITY_CHOICES.keys())
+    # legacy string columns are sorted by their typed counterparts
+    SORT_ALIASES = {'scan_time': 'scanned_at', 'scan_duration': 'scan_seconds'}
 
     # TODO: excluded = ignored
     id = Column(Integer, primary_key=True)
@@ -31,8 +45,12 @@ class SecurityResultsSAST(db_tools.AbstractBaseMixin, db.Base, rpc_tools.RpcMixi
     start_date = Column(DateTime, default=dt.utcnow)
     duration = Column(String(128), unique=False)  # todo: remove?
     #
-    scan_time = Column(String(128), unique=False)
-    scan_duration = Column(String(128), unique=False)
+    scan_time = Column(String(128), unique=False)  # todo: remove, superseded by scanned_at
+    scan_duration = Column(String(128), unique=False)  # todo: remove, superseded by scan_seconds
+    scanned_at = Column(DateTime, unique=False, nullable=True)
+    scan_seconds = Column(Float, unique=False, nullable=True)
+    # findings moved to archive parts listed in archive_manifest_name by retention policy
+    archived_at = Column(DateTime, unique=False, nullable=True)
     project_name = Column(String(128), unique=False)
     app_name = Column(String(128), unique=False)
     dast_target = Column(String(128), unique=False)
@@ -55,7 +73,15 @@ class SecurityResultsSAST(db_tools.AbstractBaseMixin, db.Base, rpc_tools.RpcMixi
             "description": "Process details description"
         }
     )
-    test_config = Column(JSON, nullable=False, unique=False)
+    # copy of the test kept by results created before test_snapshot was introduced
+    legacy_test_config = Column('test_config', JSON, nullable=True, unique=False)
+    test_snapshot = Column(String(64), nullable=True, unique=False)
+
+    @property
+    def test_config(self) -> dict:
+        if self.test_snapshot:
+            return SecurityTestSnapshot.get_data(self.test_snapshot)
+        return self.legacy_test_config
 
     # TODO: write this method
     def set_test_status(self, ts):
@@ -71,16 +97,59 @@ class SecurityResultsSAST(db_tools.AbstractBaseMixin, db.Base, rpc_tools.RpcMixi
     def bucket_name(self):
         return f'run--{self.id}'
 
+    @property
+    def archive_manifest_name(self):
+        return 'findings_archive.json'
+
+    @staticmethod
+    def archive_part_name(index: int) -> str:
+        return f'findings_archive_{index:05d}.jsonl.gz'
+
     def get_minio_client(self) -> MinioClient:
         return MinioClient(self.rpc.call.project_get_or_404(self.project_id))
 
     def insert(self):
-        self.test_config = SecurityTestsSAST.query.get(self.test_id).to_json()
+        self.test_snapshot = SecurityTestSnapshot.store(
+            TestSnapshot.from_test(SecurityTestsSAST.query.get(self.test_id))
+        )
         super().insert()
+        SecurityOverview.apply_deltas([(self.project_id, self.start_date, {'runs': 1})])
+        self.commit()
         # minio part
         minio_client = self.get_minio_client()
         minio_client.create_bucket(bucket=self.bucket_name, bucket_type='autogenerated')
 
+    @classmethod
+    def sort_rule(cls, sort: str, order: str):
+        return getattr(getattr(cls, cls.SORT_ALIASES.get(sort, sort)), order)()
+
+    @classmethod
+    def migrate_scan_columns(cls, batch_size: int = 1000) -> int:
+        """ Fills scanned_at and scan_seconds from legacy string columns in batches, returns migrated count """
+        migrated, last_id = 0, 0
+        while True:
+            rows = cls.query.with_entities(cls.id, cls.scan_time, cls.scan_duration).filter(
+                cls.id > last_id,
+                cls.scanned_at.is_(None),
+                cls.scan_time.isnot(None),
+            ).order_by(cls.id).limit(batch_size).all()
+            if not rows:
+                return migrated
+            mappings = []
+            for id_, scan_time, scan_duration in rows:
+                try:
+                    mappings.append({
+                        'id': id_,
+                        'scanned_at': dt.fromisoformat(scan_time.replace('T', ' ').split('.')[0]),
+                        'scan_seconds': float(scan_duration) if scan_duration else None,
+                    })
+                except ValueError:
+                    log.warning('Cannot migrate scan time of result %s: %s, %s', id_, scan_time, scan_duration)
+            db.session.bulk_update_mappings(cls, mappings)
+            cls.commit()
+            migrated += len(mappings)
+            last_id = rows[-1][0]
+
     def to_json(self, exclude_fields: tuple = ()) -> dict:    
         test_param = super().to_json(exclude_fields)    
         test_param["name"] = test_param.pop("test_name")    
@@ -88,42 +157,164 @@ class SecurityResultsSAST(db_tools.AbstractBaseMixin, db.Base, rpc_tools.RpcMixi
             test_param["ended_date"] = self.start_date + timedelta(seconds=float(self.duration))    
         return test_param
 
-    def update_severity_counts(self):
-        counts = SecurityReport.query.with_entities(
-            SecurityReport.severity, func.count(SecurityReport.severity),
+    @staticmethod
+    def _counts_columns() -> list:
+        return [
+            *(
+                func.count(SecurityReport.id).filter(SecurityReport.severity == i).label(i)
+                for i in SecurityReport.SEVERITY_CHOICES.keys()
+            ),
+            *(
+                func.count(SecurityReport.id).filter(SecurityReport.status == i).label(i)
+                for i in SecurityReport.STATUS_CHOICES.keys()
+            ),
+            func.count(SecurityReport.id).label('findings'),
+        ]
+
+    @classmethod
+    def refresh_counts(cls, result_ids: set) -> dict:
+        """ Recounts severity, status and findings counters of results in a single aggregation """
+        if not result_ids:
+            return dict()
+        empty = dict.fromkeys(
+            [*SecurityReport.SEVERITY_CHOICES.keys(), *SecurityReport.STATUS_CHOICES.keys(), 'findings'], 0
+        )
+        update_dict = {i: {'id': i, **empty} for i in result_ids}
+        stored = cls.query.with_entities(
+            cls.id, cls.project_id, cls.start_date, *(getattr(cls, i) for i in empty)
+        ).filter(cls.id.in_(result_ids)).all()
+        rows = SecurityReport.query.with_entities(
+            SecurityReport.report_id, *cls._counts_columns()
         ).filter(
-            SecurityReport.report_id == self.id,
+            SecurityReport.report_id.in_(result_ids),
         ).group_by(
-            SecurityReport.severity,
+            SecurityReport.report_id,
         ).all()
-        update_dict = dict.fromkeys(SecurityReport.SEVERITY_CHOICES.keys(), 0)
-        update_dict.update(dict(counts))
-        for k, v in update_dict.items():
-            setattr(self, k, v)
-        self.commit()
+        for report_id, *counts in rows:
+            update_dict[report_id].update(zip(empty.keys(), counts))
+        db.session.bulk_update_mappings(cls, list(update_dict.values()))
+        SecurityOverview.apply_deltas(
+            (project_id, start_date, {k: update_dict[result_id][k] - (v or 0) for k, v in zip(empty, counts)})
+            for result_id, project_id, start_date, *counts in stored
+        )
+        cls.commit()
         return update_dict
 
-    def update_status_counts(self):
-        counts = SecurityReport.query.with_entities(
-            SecurityReport.status, func.count(SecurityReport.status),
-        ).filter(
-            SecurityReport.report_id == self.id,
+    @classmethod
+    def apply_counts_delta(cls, deltas: dict) -> None:
+        """
+        Shifts counters and project overview by the size of a change instead of recounting,
+        commit is up to caller
+
+        :param deltas: {result_id: {counter name: delta}}
+        """
+        if not deltas:
+            return
+        SecurityOverview.apply_deltas(
+            (project_id, start_date, deltas[result_id])
+            for result_id, project_id, start_date in cls.query.with_entities(
+                cls.id, cls.project_id, cls.start_date
+            ).filter(cls.id.in_(deltas))
+        )
+        for result_id, delta in deltas.items():
+            values = {
+                getattr(cls, k): func.coalesce(getattr(cls, k), 0) + v
+                for k, v in delta.items() if v
+            }
+            if values:
+                cls.query.filter(cls.id == result_id).update(values, synchronize_session=False)
+
+    @classmethod
+    def reconcile_counts(cls, project_id: int = None) -> list:
+        """ Fixes counters that drifted from findings table, returns ids of fixed results """
+        counters = [*SecurityReport.SEVERITY_CHOICES.keys(), *SecurityReport.STATUS_CHOICES.keys(), 'findings']
+        # counters of archived results are all that is left of their findings
+        stored = cls.query.with_entities(cls.id, *(getattr(cls, i) for i in counters)).filter(
+            cls.archived_at.is_(None)
+        )
+        actual = SecurityReport.query.with_entities(
+            SecurityReport.report_id, *cls._counts_columns()
         ).group_by(
-            SecurityReport.status
-        ).all()
-        update_dict = dict.fromkeys(SecurityReport.STATUS_CHOICES.keys(), 0)
-        update_dict.update(dict(counts))
-        for k, v in update_dict.items():
-            setattr(self, k, v)
-        self.commit()
-        return update_dict
+            SecurityReport.report_id,
+        )
+        if project_id is not None:
+            stored = stored.filter(cls.project_id == project_id)
+            actual = actual.filter(SecurityReport.project_id == project_id)
+        actual = {report_id: tuple(counts) for report_id, *counts in actual.all()}
+        empty = (0,) * len(counters)
+        fixed = [
+            {'id': result_id, **dict(zip(counters, actual.get(result_id, empty)))}
+            for result_id, *counts in stored.all()
+            if tuple(i or 0 for i in counts) != actual.get(result_id, empty)
+        ]
+        if fixed:
+            db.session.bulk_update_mappings(cls, fixed)
+            cls.commit()
+        # overview drifts along with counters
+        cls.rebuild_overview(project_id)
+        return [i['id'] for i in fixed]
 
-    def update_findings_counts(self):
-        self.findings = SecurityReport.query.filter(
-            SecurityReport.report_id == self.id
-        ).count()
-        self.commit()
+    @classmethod
+    def latest_by_test(cls, test_ids: Iterable[int]) -> dict:
+        """ Summary of the latest result of every test with a single DISTINCT ON query """
+        test_ids = set(test_ids)
+        if not test_ids:
+            return dict()
+        columns = [
+            cls.id, cls.test_id, cls.test_status, cls.start_date, cls.duration,
+            cls.findings, *(getattr(cls, i) for i in SecurityReport.SEVERITY_CHOICES.keys()),
+        ]
+        rows = cls.query.with_entities(*columns).filter(
+            cls.test_id.in_(test_ids),
+        ).distinct(cls.test_id).order_by(cls.test_id, cls.id.desc()).all()
+        latest = dict()
+        for row in rows:
+            summary = dict(row._mapping)
+            test_status = summary.pop('test_status') or dict()
+            summary['status'] = test_status.get('status')
+            if summary['start_date']:
+                summary['start_date'] = summary['start_date'].isoformat()
+            latest[summary.pop('test_id')] = summary
+        return latest
+
+    @classmethod
+    def rebuild_overview(cls, project_id: int = None) -> None:
+        """
+        Brings SecurityOverview in line with results counters
 
+        Results and overview are read by a single statement and the difference is added to overview rows,
+        so changes committed by concurrent apply_deltas calls are neither lost nor counted twice
+        """
+        counters = list(SecurityOverview.COUNTERS)
+        expected = select(
+            literal(1).label('sign'), cls.project_id, literal(None, String).label('period'),
+            cls.start_date.label('bucket'),
+            *(func.coalesce(getattr(cls, i), 0).label(i) for i in counters if i != 'runs'),
+            literal(1).label('runs'),
+        )
+        actual = select(
+            literal(-1).label('sign'), SecurityOverview.project_id, SecurityOverview.period,
+            SecurityOverview.bucket, *(getattr(SecurityOverview, i) for i in counters),
+        )
+        if project_id is not None:
+            expected = expected.where(cls.project_id == project_id)
+            actual = actual.where(SecurityOverview.project_id == project_id)
+        rows = defaultdict(lambda: dict.fromkeys(counters, 0))
+        for sign, project, period, bucket, *counts in db.session.execute(union_all(expected, actual)):
+            if period is None:
+                keys = (
+                    (project, SecurityOverview.TOTAL, SecurityOverview.TOTAL_BUCKET),
+                    (project, SecurityOverview.DAY, SecurityOverview.bucket_of(bucket)),
+                )
+            else:
+                keys = ((project, period, SecurityOverview.bucket_of(bucket)),)
+            for key in keys:
+                for k, v in zip(counters, counts):
+                    rows[key][k] += sign * (v or 0)
+        SecurityOverview.shift(rows)
+        cls.commit()
 
 for i in [*SecurityReport.STATUS_CHOICES.keys(), *SecurityReport.SEVERITY_CHOICES.keys()]:
     setattr(SecurityResultsSAST, i, Column(Integer, unique=False, default=0))
+# latest run of every test, see latest_by_test
+Index('security_results_sast_test_id_idx', SecurityResultsSAST.test_id, SecurityResultsSAST.id.desc())
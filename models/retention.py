@@ -0,0 +1,51 @@
+from datetime import datetime as dt, timedelta
+
+from sqlalchemy import Column, Integer, Boolean, DateTime, and_, func, select
+
+from tools import db_tools, db
+
+from .results import SecurityResultsSAST
+from .ingestion_jobs import SecurityIngestionJob
+
+
+class SecurityRetentionPolicy(db_tools.AbstractBaseMixin, db.Base):
+    """
+    Per project rules for moving findings of old runs to the cold archive
+
+    A run is kept while it is one of keep_runs latest runs of its test_uid or is newer than keep_days,
+    a rule which is not set keeps nothing by itself
+    """
+    __tablename__ = "security_sast_retention_policies"
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, unique=True, nullable=False)
+    keep_runs = Column(Integer, unique=False, nullable=True)
+    keep_days = Column(Integer, unique=False, nullable=True)
+    enabled = Column(Boolean, unique=False, default=True)
+    applied_at = Column(DateTime, unique=False, nullable=True)
+
+    def expired_results(self, limit: int = None) -> list:
+        """ Ids of not yet archived runs the policy no longer keeps, oldest first """
+        if not self.keep_runs and not self.keep_days:
+            return []
+        run_number = func.row_number().over(
+            partition_by=SecurityResultsSAST.test_uid,
+            order_by=SecurityResultsSAST.id.desc(),
+        ).label('run_number')
+        runs = select(
+            SecurityResultsSAST.id, SecurityResultsSAST.start_date, SecurityResultsSAST.archived_at, run_number
+        ).where(
+            SecurityResultsSAST.project_id == self.project_id,
+        ).subquery()
+
+        expired = [runs.c.archived_at.is_(None)]
+        if self.keep_runs:
+            expired.append(runs.c.run_number > self.keep_runs)
+        if self.keep_days:
+            expired.append(runs.c.start_date < dt.utcnow() - timedelta(days=self.keep_days))
+        # runs still receiving findings are never archived
+        ingesting = select(SecurityIngestionJob.report_id).where(SecurityIngestionJob.unfinished_filter())
+        query = select(runs.c.id).where(
+            and_(*expired), runs.c.id.not_in(ingesting)
+        ).order_by(runs.c.id).limit(limit)
+        return [i for i, in db.session.execute(query)]
@@ -0,0 +1,86 @@
+from sqlalchemy import Index, func, literal_column, or_, select
+
+from tools import db
+
+from .details import SecurityDetails
+from .reports import SecurityReport
+from .results import SecurityResultsSAST
+
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+# tsvector size is limited, only the beginning of huge details is indexed
+SEARCH_DETAILS_LENGTH = 65536
+RESULTS_SEARCH_COLUMNS = ('project_name', 'app_name', 'scan_type', 'environment')
+
+
+def search_vector(*columns):
+    document = func.coalesce(columns[0], '')
+    for column in columns[1:]:
+        document = document.op('||')(' ').op('||')(func.coalesce(column, ''))
+    return func.to_tsvector(SEARCH_CONFIG, document)
+
+
+def findings_vector():
+    return search_vector(SecurityReport.description, SecurityReport.tool_name, SecurityReport.endpoints)
+
+
+def details_vector():
+    return search_vector(func.substr(SecurityDetails.details, 1, SEARCH_DETAILS_LENGTH))
+
+
+def is_postgres() -> bool:
+    return db.engine.dialect.name == 'postgresql'
+
+
+def findings_search(project_id: int, term: str) -> tuple:
+    """
+    Filter and rank for findings matching term in description, tool, endpoints or details
+
+    :return: filter clause, rank expression (None if ranking is not supported)
+    """
+    if not is_postgres():
+        pattern = f'%{term}%'
+        return or_(
+            SecurityReport.description.ilike(pattern),
+            SecurityReport.tool_name.ilike(pattern),
+            SecurityReport.endpoints.ilike(pattern),
+            SecurityReport.details.in_(
+                select(SecurityDetails.id).where(
+                    SecurityDetails.project_id == project_id,
+                    SecurityDetails.details.ilike(pattern),
+                )
+            ),
+        ), None
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, term)
+    return or_(
+        findings_vector().op('@@')(query),
+        SecurityReport.details.in_(
+            select(SecurityDetails.id).where(
+                SecurityDetails.project_id == project_id,
+                details_vector().op('@@')(query),
+            )
+        ),
+    ), func.ts_rank(findings_vector(), query).desc()
+
+
+def results_search(term: str):
+    """ Substring search over results, backed by trigram indexes when pg_trgm is available """
+    return or_(*(getattr(SecurityResultsSAST, i).ilike(f'%{term}%') for i in RESULTS_SEARCH_COLUMNS))
+
+
+def search_indexes() -> list:
+    return [
+        Index('security_sast_report_search_idx', findings_vector(), postgresql_using='gin'),
+        Index('security_sast_details_search_idx', details_vector(), postgresql_using='gin'),
+    ]
+
+
+def trigram_indexes() -> list:
+    return [
+        Index(
+            f'security_results_sast_{i}_trgm_idx',
+            getattr(SecurityResultsSAST, i),
+            postgresql_using='gin',
+            postgresql_ops={i: 'gin_trgm_ops'},
+        )
+        for i in RESULTS_SEARCH_COLUMNS
+    ]
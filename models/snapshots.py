@@ -0,0 +1,81 @@
+from dataclasses import dataclass, fields
+from datetime import datetime as dt, timedelta
+from functools import cached_property
+from hashlib import sha256
+from json import dumps, loads
+from typing import Optional
+
+from sqlalchemy import Column, String, JSON, DateTime, exists
+from sqlalchemy.dialects.postgresql import insert
+
+from tools import db_tools, db
+
+
+SNAPSHOT_GRACE_PERIOD = timedelta(days=1)
+
+
+@dataclass(frozen=True)
+class TestSnapshot:
+    """ Immutable part of a test integrations and results need, without per run fields """
+    id: int
+    project_id: int
+    project_name: str
+    test_uid: str
+    name: str
+    description: Optional[str]
+    scan_location: str
+    source: dict
+    integrations: dict
+    test_parameters: list
+
+    @classmethod
+    def from_test(cls, test) -> 'TestSnapshot':
+        # json round trip detaches nested values from the orm instance
+        return cls(**loads(dumps({i.name: getattr(test, i.name) for i in fields(cls)}, default=str)))
+
+    @cached_property
+    def payload(self) -> dict:
+        """ Built once, shared by all rpc calls of a config build, must not be modified """
+        return {i.name: getattr(self, i.name) for i in fields(self)}
+
+    @cached_property
+    def digest(self) -> str:
+        return sha256(dumps(self.payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class SecurityTestSnapshot(db_tools.AbstractBaseMixin, db.Base):
+    """ Content addressed test snapshots results refer to instead of keeping a copy of the test each """
+    __tablename__ = "security_sast_test_snapshots"
+
+    digest = Column(String(64), primary_key=True)
+    data = Column(JSON, nullable=False)
+    # refreshed by every store, unreferenced snapshots are kept for a while to survive reuse races
+    used_at = Column(DateTime, default=dt.utcnow)
+
+    @classmethod
+    def store(cls, snapshot: TestSnapshot) -> str:
+        """ Saves snapshot unless it is already stored, commit is up to caller """
+        stmt = insert(cls.__table__).values(
+            digest=snapshot.digest, data=snapshot.payload, used_at=dt.utcnow()
+        )
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[cls.digest], set_={'used_at': stmt.excluded.used_at}
+        ))
+        return snapshot.digest
+
+    @classmethod
+    def get_data(cls, digest: str) -> Optional[dict]:
+        snapshot = cls.query.get(digest)
+        return snapshot.data if snapshot else None
+
+    @classmethod
+    def delete_unreferenced(cls, referenced_by, grace: timedelta = SNAPSHOT_GRACE_PERIOD) -> int:
+        """
+        Deletes snapshots no result refers to and nothing stored within grace period, commit is up to caller
+
+        :param referenced_by: column holding snapshot digests
+        """
+        return cls.query.filter(
+            cls.used_at < dt.utcnow() - grace,
+            ~exists().where(referenced_by == cls.digest),
+        ).delete(synchronize_session=False)
@@ -12,17 +12,55 @@
 #     See the License for the specific language governing permissions and
 #     limitations under the License.
 
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait
+from hashlib import sha256
 from json import dumps
 from queue import Empty
-from typing import List, Union
+from typing import List, Optional, Tuple, Union
 from sqlalchemy import Column, Integer, String, ARRAY, JSON, and_
-from tools import rpc_tools, db, db_tools, constants, secrets_tools
+from tools import rpc_tools, db, db_tools, constants
 from pylon.core.tools import log  # pylint: disable=E0611,E0401
 
+from ..caches import missing_rpcs, project_secrets, integration_settings
+from .snapshots import TestSnapshot
+
+DUSTY_CONFIG_SECTIONS = ('scanners', 'processing', 'reporters')
+DUSTY_CONFIG_TIMEOUT = 2
+CONFIG_RUN_FIELDS = ('build_id', 'results_test_id')
+_NOT_CACHED = object()
+
+
+def call_concurrently(rpc, calls: dict, timeout: float) -> Tuple[dict, list]:
+    """
+    Calls rpc functions at once on a pool of their own, calls left running after timeout
+    end with their rpc timeout and never delay calls of another build
+
+    :param calls: {key: (function name, kwargs)}
+    :param timeout: overall deadline for all calls, counted from their start
+    :return: {key: result} of calls answered in time and keys of the rest
+    """
+    if not calls:
+        return dict(), []
+    pool = ThreadPoolExecutor(max_workers=len(calls), thread_name_prefix='security_sast_rpc')
+    futures = {
+        key: pool.submit(missing_rpcs.call, rpc, func, timeout=timeout, **kwargs)
+        for key, (func, kwargs) in calls.items()
+    }
+    pool.shutdown(wait=False)
+    wait(futures.values(), timeout=timeout)
+    results, timed_out = dict(), []
+    for key, future in futures.items():
+        try:
+            results[key] = future.result(timeout=0)
+        except (Empty, TimeoutError):
+            timed_out.append(key)
+    return results, timed_out
+
 
 class SecurityTestsSAST(db_tools.AbstractBaseMixin, db.Base, rpc_tools.RpcMixin):
     """ Security Tests: SAST """
     __tablename__ = "security_tests_sast"
+    CURSOR_SORT_KEYS = ('id', 'name', 'test_uid')
     id = Column(Integer, primary_key=True)
     project_id = Column(Integer, unique=False, nullable=False)
     project_name = Column(String(64), nullable=False)
@@ -75,221 +113,274 @@ class SecurityTestsSAST(db_tools.AbstractBaseMixin, db.Base, rpc_tools.RpcMixin)
         )
 
 
-    def configure_execution_json(self, output="cc", execution=False, thresholds={}):
-        """ Create configuration for execution """
-        #
-        if output == "dusty":
-            #
-            from flask import current_app
-            global_sast_settings = dict()
-            global_sast_settings["max_concurrent_scanners"] = 1
-            loki_settings = current_app.config["CONTEXT"].settings["loki"]
-
-            if "git_" in self.source.get("name"):
-                actions_config = {
-                    "git_clone": {
-                        "source": self.source.get("repo"),
-                        "branch": self.source.get("branch"),
-                        "target": "/tmp/code"
-                    }
-                }
+    def dusty_integrations_config(self, timeout: float = DUSTY_CONFIG_TIMEOUT) -> Tuple[dict, list]:
+        """
+        Calls dusty_config rpc of every scanner, processor and reporter concurrently
 
-                if self.source.get("name") == "git_https":
-                    if self.source.get("username") != "":
-                        actions_config["git_clone"]["username"] = secrets_tools.unsecret(self.source.get("username"), project_id=self.project_id)
-                    if self.source.get("password") != "":
-                        actions_config["git_clone"]["password"] = secrets_tools.unsecret(self.source.get("password"), project_id=self.project_id)
-
-                if self.source.get("name") == "git_ssh":
-                    secret_value = secrets_tools.unsecret(self.source.get("private_key"), project_id=self.project_id)
-                    actions_config["git_clone"]["key_data"] = secret_value.replace("\n", "|")
-                    actions_config["git_clone"]["password"] = secrets_tools.unsecret(self.source.get("password"), project_id=self.project_id)
-
-
-            if self.source.get("name") == "artifact":
-                actions_config = {
-                    "galloper_artifact": {
-                        "bucket": self.source.get("file_meta", {}).get("bucket", None),
-                        "object": self.source.get("file_meta", {}).get("filename", None),
-                        "target": "/tmp/code",
-                        "delete": False
-                    } 
-                }
-            
-            if self.source.get("name") == "local":
-                actions_config = {
-                    "galloper_artifact": {
-                        "bucket": "sast",
-                        "object": f"{self.build_id}.zip",
-                        "target": "/tmp/code",
-                        "delete": False
-                    }
-                }
-            
-            if self.source.get("name") == "container":
-                actions_config = {
-                    "container_metadata": {
-                        "image_name": self.source.get('image_name'),
-                    }
+        :param timeout: overall deadline for all calls
+        :return: {section: {config name: config}} merged in integrations order
+                and "section.integration" names which did not answer in time
+        """
+        test_params = TestSnapshot.from_test(self).payload
+        answered, missing = call_concurrently(self.rpc, {
+            (section, name): (f'dusty_config_{name}', {
+                'context': None,
+                'test_params': test_params,
+                'scanner_params': self.integrations[section][name],
+            })
+            for section in DUSTY_CONFIG_SECTIONS
+            for name in self.integrations.get(section, [])
+        }, timeout)
+        configs = {section: dict() for section in DUSTY_CONFIG_SECTIONS}
+        timed_out = []
+        for section in DUSTY_CONFIG_SECTIONS:
+            for name in self.integrations.get(section, []):
+                if (section, name) in missing:
+                    log.warning(f'Cannot find {section} config rpc for {name}')
+                    timed_out.append(f'{section}.{name}')
+                    continue
+                config_name, config_data = answered[(section, name)]
+                configs[section][config_name] = config_data
+        return configs, timed_out
+
+    def integrations_settings(self, cached_only: bool = False,
+                              timeout: float = DUSTY_CONFIG_TIMEOUT) -> Optional[dict]:
+        """
+        Settings of integrations the test refers to by id, dusty_config rpcs read them on their own
+
+        :param cached_only: use cached settings even if expired and never call integrations plugin
+        :return: {integration id: settings}, None if some of them are not available
+        """
+        ids = {
+            params['id']
+            for section in DUSTY_CONFIG_SECTIONS
+            for params in (self.integrations or {}).get(section, {}).values()
+            if isinstance(params, dict) and params.get('id') is not None
+        }
+        settings, missing = dict(), set()
+        for integration_id in ids:
+            value = integration_settings.get((self.project_id, integration_id), _NOT_CACHED, stale=cached_only)
+            if value is _NOT_CACHED:
+                missing.add(integration_id)
+            else:
+                settings[integration_id] = value
+        if missing and cached_only:
+            return None
+        fetched, timed_out = call_concurrently(self.rpc, {
+            i: ('integrations_get_by_id', {'project_id': self.project_id, 'integration_id': i})
+            for i in missing
+        }, timeout)
+        if timed_out:
+            return None
+        for integration_id, integration in fetched.items():
+            settings[integration_id] = integration.dict() if hasattr(integration, 'dict') else integration
+            integration_settings.set((self.project_id, integration_id), settings[integration_id])
+        return settings
+
+    def config_version(self, thresholds, cached_only: bool = False) -> Optional[str]:
+        """
+        Content hash of everything dusty config depends on apart from fields of current run,
+        None if referenced integrations settings are not available and config must not be cached
+
+        :param cached_only: see integrations_settings
+        """
+        settings = self.integrations_settings(cached_only=cached_only)
+        if settings is None:
+            return None
+        return sha256(dumps(
+            [self.to_json(exclude_fields=CONFIG_RUN_FIELDS), thresholds, sorted(settings.items(), key=str)],
+            sort_keys=True, default=str
+        ).encode('utf-8')).hexdigest()
+
+    def config_etag(self, version: str) -> str:
+        return sha256(f'{version}:{self.build_id}:{self.results_test_id}'.encode('utf-8')).hexdigest()
+
+    def fill_run_fields(self, dusty_config: dict) -> dict:
+        """ Sets current run fields to dusty config built for any run of the test """
+        actions = dusty_config['suites']['sast']['actions']
+        if self.source.get("name") == "local":
+            actions['galloper_artifact']['object'] = f"{self.build_id}.zip"
+        reporters = dusty_config['suites']['sast']['reporters']
+        reporters['centry_loki']['labels'].update(
+            build_id=str(self.build_id),
+            report_id=str(self.results_test_id),
+        )
+        for reporter in ('centry_status', 'centry'):
+            reporters[reporter]['test_id'] = str(self.results_test_id)
+        return dusty_config
+
+    def dusty_config(self, thresholds=None) -> Tuple[dict, list]:
+        """
+        Builds dusty config of the current run
+
+        :return: config and "section.integration" names left out of it because they did not answer in time
+        """
+        thresholds = thresholds or {}
+        from flask import current_app
+        global_sast_settings = dict()
+        global_sast_settings["max_concurrent_scanners"] = 1
+        loki_settings = current_app.config["CONTEXT"].settings["loki"]
+
+        if "git_" in self.source.get("name"):
+            actions_config = {
+                "git_clone": {
+                    "source": self.source.get("repo"),
+                    "branch": self.source.get("branch"),
+                    "target": "/tmp/code"
                 }
-            #
-            # Scanners
-            #
-            scanners_config = dict()
-            for scanner_name in self.integrations.get('scanners', []):
-                try:
-                    config_name, config_data = \
-                        self.rpc.call_function_with_timeout(
-                            func=f'dusty_config_{scanner_name}',
-                            timeout=2,
-                            context=None,
-                            test_params=self.__dict__,
-                            scanner_params=self.integrations["scanners"][scanner_name],
-                        )
-                    scanners_config[config_name] = config_data
-                except Empty:
-                    log.warning(f'Cannot find scanner config rpc for {scanner_name}')
+            }
 
-            #
-            # Processing
-            #
-            processing_config = dict()
-            for processor_name in self.integrations.get("processing", []):
-                try:
-                    config_name, config_data = \
-                        self.rpc.call_function_with_timeout(
-                            func=f"dusty_config_{processor_name}",
-                            timeout=2,
-                            context=None,
-                            test_params=self.__dict__,
-                            scanner_params=self.integrations["processing"][processor_name],
-                        )
-                    processing_config[config_name] = config_data
-                except Empty:
-                    log.warning(f'Cannot find processor config rpc for {processor_name}')
-
-
-            tholds = {}    
-            for threshold in thresholds:
-                if int(threshold['value']) > -1:
-                    tholds[threshold['name'].capitalize()] = {
-                        'comparison': threshold['comparison'],
-                        'value': int(threshold['value']),
-                    }
-
-            processing_config["quality_gate_sast"] = {
-                "thresholds": tholds
+            if self.source.get("name") == "git_https":
+                if self.source.get("username") != "":
+                    actions_config["git_clone"]["username"] = project_secrets.unsecret(self.source.get("username"), self.project_id)
+                if self.source.get("password") != "":
+                    actions_config["git_clone"]["password"] = project_secrets.unsecret(self.source.get("password"), self.project_id)
+
+            if self.source.get("name") == "git_ssh":
+                secret_value = project_secrets.unsecret(self.source.get("private_key"), self.project_id)
+                actions_config["git_clone"]["key_data"] = secret_value.replace("\n", "|")
+                actions_config["git_clone"]["password"] = project_secrets.unsecret(self.source.get("password"), self.project_id)
+
+
+        if self.source.get("name") == "artifact":
+            actions_config = {
+                "galloper_artifact": {
+                    "bucket": self.source.get("file_meta", {}).get("bucket", None),
+                    "object": self.source.get("file_meta", {}).get("filename", None),
+                    "target": "/tmp/code",
+                    "delete": False
+                } 
             }
         
-            #
-            # Reporters
-            #
-            reporters_config = dict()
-            for reporter_name in self.integrations.get('reporters', []):
-                try:
-                    config_name, config_data = \
-                        self.rpc.call_function_with_timeout(
-                            func=f'dusty_config_{reporter_name}',
-                            timeout=2,
-                            context=None,
-                            test_params=self.__dict__,
-                            scanner_params=self.integrations["reporters"][reporter_name],
-                        )
-                    reporters_config[config_name] = config_data
-                except Empty:
-                    log.warning(f'Cannot find reporter config rpc for {reporter_name}')
-
-
-            reporters_config["centry_loki"] = {
-                "url": loki_settings["url"],
-                "labels": {
-                    "project": str(self.project_id),
-                    "build_id": str(self.build_id),
-                    "report_id": str(self.results_test_id),
-                    "hostname": "dusty"
-                },
+        if self.source.get("name") == "local":
+            actions_config = {
+                "galloper_artifact": {
+                    "bucket": "sast",
+                    "object": f"{self.build_id}.zip",
+                    "target": "/tmp/code",
+                    "delete": False
+                }
             }
-            reporters_config["centry_status"] = {
-                "url": secrets_tools.unsecret(
-                    "{{secret.galloper_url}}",
-                    project_id=self.project_id
-                ),
-                "token": secrets_tools.unsecret(
-                    "{{secret.auth_token}}",
-                    project_id=self.project_id
-                ),
-                "project_id": str(self.project_id),
-                "test_id": str(self.results_test_id),
+        
+        if self.source.get("name") == "container":
+            actions_config = {
+                "container_metadata": {
+                    "image_name": self.source.get('image_name'),
+                }
             }
+        configs, timed_out = self.dusty_integrations_config()
+        scanners_config = configs['scanners']
+        processing_config = configs['processing']
+        reporters_config = configs['reporters']
 
-            reporters_config["centry"] = {
-                "url": secrets_tools.unsecret(
-                    "{{secret.galloper_url}}",
-                    project_id=self.project_id
-                ),
-                "token": secrets_tools.unsecret(
-                    "{{secret.auth_token}}",
-                    project_id=self.project_id
-                ),
-                "project_id": str(self.project_id),
-                "test_id": str(self.results_test_id),
-            }
+        tholds = {}    
+        for threshold in thresholds:
+            if int(threshold['value']) > -1:
+                tholds[threshold['name'].capitalize()] = {
+                    'comparison': threshold['comparison'],
+                    'value': int(threshold['value']),
+                }
 
-            dusty_config = {
-                "config_version": 2,
-                "suites": {
-                    "sast": {
-                        "settings": {
-                            "project_name": self.project_name,
-                            "project_description": self.name,
-                            "environment_name": "target",
-                            "testing_type": "SAST",
-                            "scan_type": "full",
-                            "build_id": self.test_uid,
-                            "sast": global_sast_settings
-                        },
-                        "actions": actions_config,
-                        "scanners": {
-                            "sast": scanners_config
-                        },
-                        "processing": processing_config,
-                        "reporters": reporters_config
-                    }
+        processing_config["quality_gate_sast"] = {
+            "thresholds": tholds
+        }
+    
+        reporters_config["centry_loki"] = {
+            "url": loki_settings["url"],
+            "labels": {
+                "project": str(self.project_id),
+                "build_id": str(self.build_id),
+                "report_id": str(self.results_test_id),
+                "hostname": "dusty"
+            },
+        }
+        reporters_config["centry_status"] = {
+            "url": project_secrets.unsecret(
+                "{{secret.galloper_url}}",
+                self.project_id
+            ),
+            "token": project_secrets.unsecret(
+                "{{secret.auth_token}}",
+                self.project_id
+            ),
+            "project_id": str(self.project_id),
+            "test_id": str(self.results_test_id),
+        }
+
+        reporters_config["centry"] = {
+            "url": project_secrets.unsecret(
+                "{{secret.galloper_url}}",
+                self.project_id
+            ),
+            "token": project_secrets.unsecret(
+                "{{secret.auth_token}}",
+                self.project_id
+            ),
+            "project_id": str(self.project_id),
+            "test_id": str(self.results_test_id),
+        }
+
+        dusty_config = {
+            "config_version": 2,
+            "suites": {
+                "sast": {
+                    "settings": {
+                        "project_name": self.project_name,
+                        "project_description": self.name,
+                        "environment_name": "target",
+                        "testing_type": "SAST",
+                        "scan_type": "full",
+                        "build_id": self.test_uid,
+                        "sast": global_sast_settings
+                    },
+                    "actions": actions_config,
+                    "scanners": {
+                        "sast": scanners_config
+                    },
+                    "processing": processing_config,
+                    "reporters": reporters_config
                 }
             }
-            #
-            return dusty_config
+        }
+        #
+        return dusty_config, timed_out
+
+    def configure_execution_json(self, output="cc", execution=False, thresholds={}):
+        """ Create configuration for execution """
+        #
+        if output == "dusty":
+            return self.dusty_config(thresholds)[0]
         #
         job_type = "sast"
         # container = f"getcarrier/{job_type}:{CURRENT_RELEASE}"
         container = f"getcarrier/sast_local"
         parameters = {
             "cmd": f"run -b centry:{job_type}_{self.test_uid} -s {job_type}",
-            "GALLOPER_URL": secrets_tools.unsecret(
+            "GALLOPER_URL": project_secrets.unsecret(
                 "{{secret.galloper_url}}",
-                project_id=self.project_id
+                self.project_id
             ),
             "GALLOPER_PROJECT_ID": f"{self.project_id}",
-            "GALLOPER_AUTH_TOKEN": secrets_tools.unsecret(
+            "GALLOPER_AUTH_TOKEN": project_secrets.unsecret(
                 "{{secret.auth_token}}",
-                project_id=self.project_id
+                self.project_id
             ),
         }
         if self.source.get("name") == "local":
             parameters["code_path"] = self.source.get("path")
 
         cc_env_vars = {
-            "RABBIT_HOST": secrets_tools.unsecret(
+            "RABBIT_HOST": project_secrets.unsecret(
                 "{{secret.rabbit_host}}",
-                project_id=self.project_id
+                self.project_id
             ),
-            "RABBIT_USER": secrets_tools.unsecret(
+            "RABBIT_USER": project_secrets.unsecret(
                 "{{secret.rabbit_user}}",
-                project_id=self.project_id
+                self.project_id
             ),
-            "RABBIT_PASSWORD": secrets_tools.unsecret(
+            "RABBIT_PASSWORD": project_secrets.unsecret(
                 "{{secret.rabbit_password}}",
-                project_id=self.project_id
+                self.project_id
             ),
             "REPORT_ID": str(self.results_test_id),
             "build_id": str(self.build_id),
@@ -303,8 +394,8 @@ class SecurityTestsSAST(db_tools.AbstractBaseMixin, db.Base, rpc_tools.RpcMixin)
                 docker_run = f"docker run --rm -i -t -v \"{self.source.get('path')}:/code\""
             return f"{docker_run} " \
                    f"-e project_id={self.project_id} " \
-                   f"-e galloper_url={secrets_tools.unsecret('{{secret.galloper_url}}', project_id=self.project_id)} " \
-                   f"-e token=\"{secrets_tools.unsecret('{{secret.auth_token}}', project_id=self.project_id)}\" " \
+                   f"-e galloper_url={project_secrets.unsecret('{{secret.galloper_url}}', self.project_id)} " \
+                   f"-e token=\"{project_secrets.unsecret('{{secret.auth_token}}', self.project_id)}\" " \
                    f"getcarrier/control_tower:{constants.CURRENT_RELEASE} " \
                    f"-tid {self.test_uid}"
 
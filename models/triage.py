@@ -0,0 +1,75 @@
+from sqlalchemy import String, Column, Integer, UniqueConstraint, case, func, select
+from sqlalchemy.dialects.postgresql import insert, aggregate_order_by, array_agg
+from tools import db_tools, db
+
+from .reports import ChoiceType, SecurityReport
+
+
+class SecurityTriage(db_tools.AbstractBaseMixin, db.Base):
+    """ Effective triage of an issue across all runs of a project """
+    __tablename__ = "security_sast_triage"
+    __table_args__ = (
+        UniqueConstraint('project_id', 'issue_hash', name='security_sast_triage_issue_uc'),
+    )
+
+    PROPAGATED_STATUSES = ('false_positive', 'ignored')
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, unique=False, nullable=False)
+    issue_hash = Column(String(128), unique=False, nullable=False)
+    status = Column(ChoiceType(SecurityReport.STATUS_CHOICES), unique=False, nullable=True)
+    severity = Column(ChoiceType(SecurityReport.SEVERITY_CHOICES), unique=False, nullable=True)
+
+    @classmethod
+    def get_index(cls, project_id: int, issue_hashes: set) -> dict:
+        if not issue_hashes:
+            return dict()
+        rows = db.session.query(cls.issue_hash, cls.status, cls.severity).filter(
+            cls.project_id == project_id,
+            cls.issue_hash.in_(issue_hashes),
+        ).all()
+        # other statuses are stored to keep the index in sync with reports, but do not carry over
+        return {
+            issue_hash: (status if status in cls.PROPAGATED_STATUSES else None, severity)
+            for issue_hash, status, severity in rows
+        }
+
+    @classmethod
+    def upsert(cls, project_id: int, issue_hashes: set, **values) -> None:
+        """ values are either status or severity set by user """
+        if not issue_hashes:
+            return
+        stmt = insert(cls.__table__).values([
+            {'project_id': project_id, 'issue_hash': i, **values} for i in issue_hashes
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.project_id, cls.issue_hash],
+            set_={k: stmt.excluded[k] for k in values}
+        )
+        db.session.execute(stmt)
+
+    @classmethod
+    def backfill(cls) -> None:
+        """ Builds triage index from statuses and latest severities already stored in reports """
+        status = case(
+            (func.bool_or(SecurityReport.status == 'ignored'), SecurityReport.STATUS_CHOICES['ignored']),
+            (func.bool_or(SecurityReport.status == 'false_positive'), SecurityReport.STATUS_CHOICES['false_positive']),
+            else_=None
+        )
+        severity = array_agg(aggregate_order_by(SecurityReport.severity, SecurityReport.id.desc()))[1]
+        triaged = select(
+            SecurityReport.project_id,
+            SecurityReport.issue_hash,
+            status,
+            severity,
+        ).where(
+            SecurityReport.issue_hash.isnot(None),
+        ).group_by(
+            SecurityReport.project_id, SecurityReport.issue_hash
+        )
+        db.session.execute(
+            insert(cls.__table__).from_select(
+                ['project_id', 'issue_hash', 'status', 'severity'], triaged
+            ).on_conflict_do_nothing()
+        )
+        db.session.commit()
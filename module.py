@@ -17,10 +17,15 @@
 
 """ Module """
 
+from concurrent.futures import ThreadPoolExecutor
+
 from pylon.core.tools import log  # pylint: disable=E0611,E0401
 from pylon.core.tools import module  # pylint: disable=E0611,E0401
 
 from .init_db import init_db
+from .utils import migrate_scan_columns_in_background
+from .ingestion import FindingsIngestionQueue
+from .retention import RetentionScheduler
 from tools import theme, shared
 
 
@@ -41,6 +46,18 @@ class Module(module.ModuleModel):
         self.descriptor.init_blueprint()
         self.descriptor.init_slots()
 
+        config = self.descriptor.config or {}
+        self.ingestion_queue = FindingsIngestionQueue(
+            workers=config.get('ingestion_workers', 4),
+            jobs_per_project=config.get('ingestion_jobs_per_project', 1),
+        )
+        self.ingestion_queue.start()
+        self.ingestion_queue.resume()
+        self.cleanup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='security_sast_cleanup')
+        self.retention_scheduler = RetentionScheduler(interval=config.get('retention_interval', 86400))
+        self.retention_scheduler.start()
+        migrate_scan_columns_in_background()
+
         try:
             theme.register_section(
                 "security",
@@ -73,3 +90,6 @@ class Module(module.ModuleModel):
     def deinit(self):  # pylint: disable=R0201
         """ De-init module """
         log.info('De-initializing module')
+        self.ingestion_queue.stop()
+        self.cleanup_executor.shutdown(wait=False)
+        self.retention_scheduler.stop()
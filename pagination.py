@@ -0,0 +1,175 @@
+import base64
+import json
+import operator
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, or_, literal, tuple_
+from sqlalchemy.exc import CompileError
+
+from .utils import ValidationErrorPD
+from .models.search import is_postgres
+from tools import db, api_tools
+
+
+TOTAL_MODES = ('exact', 'estimate', 'none')
+DEFAULT_PAGE_SIZE = 50
+
+
+def get_total(query, mode: str = 'exact') -> Optional[int]:
+    """
+    Counts rows of a listing query
+
+    :param query: filtered query without pagination
+    :param mode: exact - count(*), estimate - planner row estimate on postgres, count(*) elsewhere,
+            none - skip counting
+    """
+    if mode == 'none':
+        return None
+    if mode == 'estimate' and is_postgres():
+        try:
+            sql = query.order_by(None).statement.compile(
+                dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}
+            )
+        except (NotImplementedError, CompileError):
+            return query.order_by(None).count()
+        plan = db.session.connection().exec_driver_sql(f'EXPLAIN (FORMAT JSON) {sql}').scalar()
+        return int(plan[0]['Plan']['Plan Rows'])
+    return query.order_by(None).count()
+
+
+def encode_cursor(sort: str, order: str, value, last_id: int) -> str:
+    if isinstance(value, datetime):
+        value = {'dt': value.isoformat()}
+    payload = json.dumps({'s': sort, 'o': order, 'v': value, 'id': last_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if isinstance(payload['v'], dict):
+            payload['v'] = datetime.fromisoformat(payload['v']['dt'])
+        return payload
+    except (ValueError, KeyError, TypeError):
+        raise ValidationErrorPD('cursor', 'Invalid cursor')
+
+
+def time_range_filter(column, args: dict):
+    """ Clause for from / to iso datetime request args, None if neither is passed """
+    filter_ = []
+    for arg, compare in (('from', operator.ge), ('to', operator.le)):
+        if args.get(arg):
+            try:
+                filter_.append(compare(column, datetime.fromisoformat(args[arg])))
+            except ValueError:
+                raise ValueError(f'{arg} must be an iso formatted datetime')
+    return and_(*filter_) if filter_ else None
+
+
+def get_api_filter(project_id: int, args: dict, data_model):
+    """
+    Project filter with equality conditions of the filter arg, the only filtering api_tools.get does
+
+    api_tools.get applies it within the query it runs and does not expose it,
+    so listings that build their own query use this one
+
+    :param args: request args, filter is a json object {column name: value}
+    """
+    filter_ = [data_model.project_id == project_id]
+    if args.get('filter'):
+        for key, value in json.loads(args['filter']).items():
+            filter_.append(getattr(data_model, key) == value)
+    return and_(*filter_)
+
+
+def keyset_paginate(query, data_model, args: dict) -> Tuple[list, Optional[str]]:
+    """
+    Cursor based pagination on whitelisted sort keys, rows with null sort value come last
+
+    :param query: filtered query, its first entity must be data_model
+            or its columns must include id and the sort column
+    :param data_model: model being listed, its CURSOR_SORT_KEYS are allowed sort columns
+    :param args: request args with sort, order, limit and cursor (empty for the first page)
+    :return: page rows and next cursor (None on the last page)
+    """
+    sort = args.get('sort') or 'id'
+    order = args.get('order') or 'desc'
+    if sort not in data_model.CURSOR_SORT_KEYS:
+        raise ValidationErrorPD('sort', f'Cursor pagination supports sorting by {data_model.CURSOR_SORT_KEYS} only')
+    if order not in ('asc', 'desc'):
+        raise ValidationErrorPD('order', 'Order must be asc or desc')
+    try:
+        limit = int(args.get('limit') or DEFAULT_PAGE_SIZE)
+    except ValueError:
+        raise ValidationErrorPD('limit', 'Limit must be an integer')
+
+    column = getattr(data_model, sort)
+    compare = operator.lt if order == 'desc' else operator.gt
+    if args.get('cursor'):
+        cursor = decode_cursor(args['cursor'])
+        if (cursor['s'], cursor['o']) != (sort, order):
+            raise ValidationErrorPD('cursor', 'Cursor was issued for another sorting')
+        if sort == 'id':
+            query = query.filter(compare(data_model.id, cursor['id']))
+        elif cursor['v'] is None:
+            # nulls go last in both orders, the cursor is already among them
+            query = query.filter(column.is_(None), compare(data_model.id, cursor['id']))
+        else:
+            # row comparison is null for null sort values, they follow all other values
+            query = query.filter(or_(
+                compare(
+                    tuple_(column, data_model.id),
+                    tuple_(literal(cursor['v'], column.type), literal(cursor['id']))
+                ),
+                column.is_(None),
+            ))
+    if sort == 'id':
+        query = query.order_by(getattr(data_model.id, order)())
+    else:
+        query = query.order_by(getattr(column, order)().nulls_last(), getattr(data_model.id, order)())
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    if not isinstance(last, data_model):
+        last = last[0] if isinstance(last[0], data_model) else last._mapping
+        if not isinstance(last, data_model):
+            return rows, encode_cursor(sort, order, last[sort], last['id'])
+    return rows, encode_cursor(sort, order, getattr(last, sort), last.id)
+
+
+def get_listing(project_id: int, args: dict, data_model, entities: list = None,
+                additional_filter=None) -> Tuple[Optional[int], list, Optional[str]]:
+    """
+    api_tools.get counterpart supporting cursor pagination and total modes
+
+    :param entities: columns to select instead of data_model objects
+    :param additional_filter: extra sqlalchemy clause, e.g. search
+    :return: total, page rows and next cursor
+    """
+    total_mode = args.get('total', 'exact')
+    if total_mode not in TOTAL_MODES:
+        raise ValidationErrorPD('total', f'Total must be one of {TOTAL_MODES}')
+    if 'cursor' not in args and total_mode == 'exact' and not entities and additional_filter is None:
+        total, rows = api_tools.get(project_id, args, data_model)
+        return total, rows, None
+
+    query = db.session.query(*(entities or [data_model])).filter(get_api_filter(project_id, args, data_model))
+    if additional_filter is not None:
+        query = query.filter(additional_filter)
+    total = get_total(query, total_mode)
+    if 'cursor' in args:
+        rows, next_cursor = keyset_paginate(query, data_model, args)
+        return total, rows, next_cursor
+
+    if args.get('sort') and hasattr(data_model, 'sort_rule'):
+        sort_rule = data_model.sort_rule(args['sort'], args['order'])
+    elif args.get('sort'):
+        sort_rule = getattr(getattr(data_model, args['sort']), args['order'])()
+    else:
+        sort_rule = data_model.id.desc()
+    rows = query.order_by(sort_rule).limit(args.get('limit')).offset(args.get('offset')).all()
+    return total, rows, None
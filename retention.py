@@ -0,0 +1,215 @@
+import gzip
+import json
+import threading
+from datetime import datetime
+from io import BytesIO
+from queue import Queue, Empty
+from time import monotonic
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+
+from pylon.core.tools import log
+
+from .models.results import SecurityResultsSAST
+from .models.reports import SecurityReport
+from .models.retention import SecurityRetentionPolicy
+from .serializers.columnar import findings_serializer
+from .cleanup import delete_in_batches, delete_orphaned_details, delete_orphaned_findings
+from .export import iter_findings
+from tools import db
+
+
+ARCHIVE_PART_SIZE = 1000
+RETENTION_BATCH_SIZE = 100
+
+
+def archive_result(result_id: int) -> Optional[int]:
+    """
+    Moves findings of a result with their details text to gzipped JSONL parts in result bucket,
+    listed by a manifest with findings count and ids range of every part
+
+    Findings counts of the result are kept, orphaned details are left to delete_orphaned_details.
+    The result row stays locked until the archive is stored, so concurrent passes skip it
+
+    :return: number of archived findings, None if result is already archived or being archived
+    """
+    result = SecurityResultsSAST.query.filter(
+        SecurityResultsSAST.id == result_id,
+        SecurityResultsSAST.archived_at.is_(None),
+    ).with_for_update(skip_locked=True).first()
+    if not result:
+        db.session.rollback()
+        return None
+    minio_client = result.get_minio_client()
+    manifest = {'total': 0, 'parts': []}
+    # newest first like findings listing, so pages are read from the parts they fall into
+    for batch in iter_findings(result.project_id, result.id, list(findings_serializer.columns),
+                               order_by=(SecurityReport.id.desc(),), batch_size=ARCHIVE_PART_SIZE):
+        part = BytesIO()
+        with gzip.GzipFile(fileobj=part, mode='wb') as compressed:
+            for finding in batch:
+                compressed.write(json.dumps(finding, default=str).encode('utf-8'))
+                compressed.write(b'\n')
+        part.seek(0)
+        name = result.archive_part_name(len(manifest['parts']))
+        minio_client.upload_file(result.bucket_name, part, name)
+        manifest['parts'].append({
+            'name': name, 'count': len(batch), 'max_id': batch[0]['id'], 'min_id': batch[-1]['id'],
+            'tools': sorted({i['tool_name'] for i in batch}, key=lambda i: i or ''),
+        })
+        manifest['total'] += len(batch)
+    minio_client.upload_file(
+        result.bucket_name, BytesIO(json.dumps(manifest).encode('utf-8')), result.archive_manifest_name
+    )
+    result.archived_at = datetime.utcnow()
+    result.commit()
+    delete_in_batches(SecurityReport, SecurityReport.report_id == result.id)
+    return manifest['total']
+
+
+def read_archive_manifest(result: SecurityResultsSAST, minio_client=None) -> dict:
+    minio_client = minio_client or result.get_minio_client()
+    return json.loads(minio_client.download_file(result.bucket_name, result.archive_manifest_name))
+
+
+def read_archive_part(result: SecurityResultsSAST, part: dict, minio_client=None) -> list:
+    minio_client = minio_client or result.get_minio_client()
+    payload = gzip.decompress(minio_client.download_file(result.bucket_name, part['name']))
+    return [json.loads(line) for line in payload.splitlines() if line]
+
+
+def iter_archived_findings(result: SecurityResultsSAST, columns: list = None,
+                           offset: int = 0, manifest: dict = None) -> Iterator[list]:
+    """
+    Streams findings of an archived result newest first, one archive part per batch
+
+    :param columns: findings_serializer column names, all archived fields if not set
+    :param offset: number of findings to skip, parts before it are not downloaded
+    :param manifest: archive manifest if it is already read
+    """
+    minio_client = result.get_minio_client()
+    manifest = manifest or read_archive_manifest(result, minio_client)
+    for part in manifest['parts']:
+        if offset >= part['count']:
+            offset -= part['count']
+            continue
+        batch = read_archive_part(result, part, minio_client)[offset:]
+        offset = 0
+        yield _select_columns(batch, columns)
+
+
+def iter_archived_findings_by_tool(result: SecurityResultsSAST, columns: list = None) -> Iterator[list]:
+    """
+    Streams findings of an archived result grouped by tool_name, e.g. for sarif runs,
+    every part is read once per tool it has findings of
+
+    :param columns: findings_serializer column names, all archived fields if not set
+    """
+    minio_client = result.get_minio_client()
+    parts = read_archive_manifest(result, minio_client)['parts']
+    for tool in sorted({i for part in parts for i in part['tools']}, key=lambda i: i or ''):
+        for part in parts:
+            if tool in part['tools']:
+                batch = [i for i in read_archive_part(result, part, minio_client) if i['tool_name'] == tool]
+                yield _select_columns(batch, columns)
+
+
+def _select_columns(batch: list, columns: list = None) -> list:
+    if not columns:
+        return batch
+    keys = {findings_serializer.rename.get(i, i) for i in columns} | {'details_id', 'details'}
+    return [{k: v for k, v in i.items() if k in keys} for i in batch]
+
+
+def get_archived_finding(result: SecurityResultsSAST, finding_id: int) -> Optional[dict]:
+    """ Looks finding up in the only archive part its id may be in """
+    minio_client = result.get_minio_client()
+    for part in read_archive_manifest(result, minio_client)['parts']:
+        if part['min_id'] <= finding_id <= part['max_id']:
+            return next((i for i in read_archive_part(result, part, minio_client) if i['id'] == finding_id), None)
+    return None
+
+
+def apply_retention(project_id: int = None, limit: int = RETENTION_BATCH_SIZE) -> dict:
+    """
+    Archives runs expired by enabled retention policies
+
+    :param limit: max runs archived per project in one pass, the rest is left to the next pass
+    :return: {project id: archived result ids}
+    """
+    query = SecurityRetentionPolicy.query.filter(SecurityRetentionPolicy.enabled.is_(True))
+    if project_id is not None:
+        query = query.filter(SecurityRetentionPolicy.project_id == project_id)
+    archived = dict()
+    for policy in query.all():
+        archived[policy.project_id] = []
+        for result_id in policy.expired_results(limit):
+            try:
+                if archive_result(result_id) is None:
+                    continue
+            except Exception:
+                log.exception('Cannot archive result %s', result_id)
+                db.session.rollback()
+                continue
+            archived[policy.project_id].append(result_id)
+        # finish purges interrupted after archive was stored
+        delete_in_batches(SecurityReport, SecurityReport.report_id.in_(
+            select(SecurityResultsSAST.id).where(
+                SecurityResultsSAST.project_id == policy.project_id,
+                SecurityResultsSAST.archived_at.is_not(None),
+            )
+        ))
+        if archived[policy.project_id]:
+            delete_orphaned_details(policy.project_id)
+            log.info('Archived results %s of project %s', archived[policy.project_id], policy.project_id)
+        policy.applied_at = datetime.utcnow()
+        policy.commit()
+    return archived
+
+
+class RetentionScheduler:
+    """
+    Background thread applying retention policies of all projects and cleaning up after deleted results
+    every interval seconds, passes for single projects can be queued in between
+    """
+    ALL = None
+    _STOP = object()
+
+    def __init__(self, interval: float = 86400):
+        self.interval = interval
+        self._requests = Queue()
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._work, name='security_sast_retention', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._requests.put(self._STOP)
+
+    def submit(self, project_id: int = ALL) -> None:
+        """ Queues a pass, passes never run concurrently within the process """
+        self._requests.put(project_id)
+
+    def _work(self) -> None:
+        deadline = monotonic() + self.interval
+        while True:
+            try:
+                project_id = self._requests.get(timeout=max(deadline - monotonic(), 0))
+            except Empty:
+                project_id, deadline = self.ALL, monotonic() + self.interval
+            if project_id is self._STOP:
+                return
+            try:
+                apply_retention(project_id)
+            except Exception:
+                log.exception('Retention pass failed')
+            finally:
+                db.session.remove()
+            if project_id is self.ALL:
+                # scheduled pass also finishes cleanups of deleted results lost on restart
+                try:
+                    delete_orphaned_findings()
+                finally:
+                    db.session.remove()
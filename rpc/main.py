@@ -1,12 +1,13 @@
 from typing import Optional
 
-from sqlalchemy.sql import func, LABEL_STYLE_TABLENAME_PLUS_COL
-
 from ..models.tests import SecurityTestsSAST
 from ..models.pd.security_test import SecurityTestParams, SecurityTestCommon
 from ..models.reports import SecurityReport
 from ..models.results import SecurityResultsSAST
+from ..models.overview import SecurityOverview
 from ..utils import run_test
+from ..retention import apply_retention
+from ..caches import missing_rpcs, project_secrets, execution_configs, integration_settings
 
 from tools import rpc_tools
 
@@ -26,16 +27,44 @@ class RPC:
     @web.rpc('security_sast_overview_data', 'overview_data')
     @rpc_tools.wrap_exceptions(RuntimeError)
     def overview_data(self, project_id: int) -> dict:
-        queries = [
-            func.sum(getattr(SecurityResultsSAST, i)).label(f'sum_{i}')
-            for i in SecurityReport.SEVERITY_CHOICES.keys()
-        ]
-        q = SecurityResultsSAST.query.with_entities(
-            *queries
-        ).filter(
-            SecurityResultsSAST.project_id == project_id,
-        )
-        return dict(zip([i['name'] for i in q.column_descriptions], q.first()))
+        total = SecurityOverview.get_total(project_id)
+        return {f'sum_{i}': total[i] for i in SecurityReport.SEVERITY_CHOICES.keys()}
+
+    @web.rpc('security_sast_overview_series', 'overview_series')
+    @rpc_tools.wrap_exceptions(RuntimeError)
+    def overview_series(self, project_id: int, period: str = 'day') -> list:
+        if period not in SecurityOverview.PERIODS:
+            raise RuntimeError(f'period must be one of {SecurityOverview.PERIODS}')
+        return SecurityOverview.get_series(project_id, period)
+
+    @web.rpc('security_sast_reconcile_counts', 'reconcile_counts')
+    @rpc_tools.wrap_exceptions(RuntimeError)
+    def reconcile_counts(self, project_id: Optional[int] = None) -> list:
+        return SecurityResultsSAST.reconcile_counts(project_id)
+
+    @web.rpc('security_sast_apply_retention', 'apply_retention')
+    @rpc_tools.wrap_exceptions(RuntimeError)
+    def apply_retention(self, project_id: Optional[int] = None) -> dict:
+        return apply_retention(project_id)
+
+    @web.rpc('security_sast_rpc_registered', 'rpc_registered')
+    @rpc_tools.wrap_exceptions(RuntimeError)
+    def rpc_registered(self, func_names: Optional[list] = None) -> None:
+        """ Lets plugins providing dusty_config or test_create rpc clear them from missing ones """
+        missing_rpcs.forget(func_names)
+
+    @web.rpc('security_sast_secrets_changed', 'secrets_changed')
+    @rpc_tools.wrap_exceptions(RuntimeError)
+    def secrets_changed(self, project_id: Optional[int] = None) -> None:
+        """ Drops cached secrets of the project, of all projects if not set, and configs they are part of """
+        project_secrets.invalidate(project_id)
+        execution_configs.clear()
+
+    @web.rpc('security_sast_integrations_changed', 'integrations_changed')
+    @rpc_tools.wrap_exceptions(RuntimeError)
+    def integrations_changed(self) -> None:
+        """ Drops cached integrations settings, configs built with old ones are versioned apart """
+        integration_settings.clear()
 
     @web.rpc('security_sast_test_create_test_parameters', 'parse_test_parameters')
     @rpc_tools.wrap_exceptions(ValidationError)
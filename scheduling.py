@@ -0,0 +1,39 @@
+from queue import Empty
+from typing import Iterable, Tuple
+
+from .caches import TTLCache
+
+
+SCHEDULES_TTL = 30
+SCHEDULES_RPC_TIMEOUT = 2
+schedules_cache = TTLCache(ttl=SCHEDULES_TTL)
+
+
+def load_schedules(rpc_manager, schedule_ids: Iterable[int]) -> Tuple[dict, bool]:
+    """
+    Schedules by id resolved with a single scheduling rpc call for all ids not cached yet
+
+    :return: schedules and stale flag set when scheduling did not answer in time,
+            expired cached schedules are returned then
+    """
+    schedules, missing = dict(), set()
+    for i in set(schedule_ids):
+        cached = schedules_cache.get(i)
+        if cached is None:
+            missing.add(i)
+        else:
+            schedules[i] = cached
+    if not missing:
+        return schedules, False
+    try:
+        loaded = rpc_manager.timeout(SCHEDULES_RPC_TIMEOUT).scheduling_security_load_from_db_by_ids(list(missing))
+    except Empty:
+        for i in missing:
+            cached = schedules_cache.get(i, stale=True)
+            if cached is not None:
+                schedules[i] = cached
+        return schedules, True
+    for schedule in loaded:
+        schedules_cache.set(schedule['id'], schedule)
+        schedules[schedule['id']] = schedule
+    return schedules, False
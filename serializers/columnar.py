@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import String, func, select, type_coerce
+
+from ..models.reports import SecurityReport
+from ..models.results import SecurityResultsSAST
+from ..models.snapshots import SecurityTestSnapshot
+
+
+def requested_fields(args: dict) -> list:
+    """ Field names of fields= projection request argument """
+    return [i.strip() for i in args.get('fields', '').split(',') if i.strip()]
+
+
+def cursor_fields(args: dict) -> tuple:
+    """ Columns cursor pagination needs to be selected """
+    return ('id', args.get('sort') or 'id') if 'cursor' in args else ()
+
+
+def choice_decoder(choices: dict) -> Callable:
+    """ Maps stored ChoiceType value straight to its api representation """
+    decode = dict()
+    for key, stored in choices.items():
+        decode[key] = decode[stored.lower()] = key.replace('_', ' ')
+    return lambda value: decode.get(value.lower(), value)
+
+
+class ColumnarSerializer:
+    """
+    Builds response dicts from plain column tuples, without hydrating ORM objects
+
+    :param model: model to select columns of
+    :param rename: {column name: api name}
+    :param formatters: {column name: callable} applied to not null values,
+            columns having a formatter are selected raw, skipping their type result processing
+    :param post: callable applied to every built dict
+    :param expressions: {column name: sql expression} selected instead of the column
+    """
+
+    def __init__(self, model, rename: dict = None, formatters: dict = None, post: Callable = None,
+                 expressions: dict = None):
+        self.model = model
+        self.columns = {c.name: c for c in model.__table__.columns}
+        for name, expression in (expressions or dict()).items():
+            self.columns[name] = expression.label(name)
+        self.rename = rename or dict()
+        self.names = {self.rename.get(i, i): i for i in self.columns}
+        self.formatters = formatters or dict()
+        self.post = post
+
+    def parse_fields(self, fields: Optional[Iterable[str]], required: Iterable[str] = ()) -> list:
+        """
+        Column names for requested api field names, all columns if fields are empty
+
+        :param required: column names selected anyway, e.g. keys cursor pagination relies on
+        """
+        if not fields:
+            return list(self.columns)
+        unknown = set(fields).difference(self.names)
+        if unknown:
+            raise ValueError(f'Unknown fields: {", ".join(sorted(unknown))}')
+        columns = [self.names[i] for i in fields]
+        columns.extend(i for i in required if i in self.columns and i not in columns)
+        return columns
+
+    def entities(self, columns: list) -> list:
+        return [
+            type_coerce(self.columns[i], String).label(i) if i in self.formatters else self.columns[i]
+            for i in columns
+        ]
+
+    def dump(self, columns: list, rows: Iterable) -> list:
+        keys = [self.rename.get(i, i) for i in columns]
+        formatters = [
+            (n, k, self.formatters[c]) for n, (k, c) in enumerate(zip(keys, columns)) if c in self.formatters
+        ]
+        result = []
+        for row in rows:
+            item = dict(zip(keys, row))
+            for n, key, formatter in formatters:
+                if row[n] is not None:
+                    item[key] = formatter(row[n])
+            if self.post:
+                self.post(item)
+            for key, value in item.items():
+                if isinstance(value, datetime):
+                    item[key] = value.isoformat()
+            result.append(item)
+        return result
+
+
+def _results_ended_date(item: dict) -> None:
+    if item.get('duration') and item.get('start_date'):
+        item['ended_date'] = item['start_date'] + timedelta(seconds=float(item['duration']))
+
+
+def _reports_scan_fields(item: dict) -> None:
+    _results_ended_date(item)
+    # typed columns win over legacy strings, which are kept until migration finishes
+    if item.get('scanned_at'):
+        item['scan_time'] = item['scanned_at'].strftime("%Y-%m-%d %H:%M:%S")
+    if item.get('scan_seconds') is not None:
+        item['scan_duration'] = item['scan_seconds']
+
+
+findings_serializer = ColumnarSerializer(
+    SecurityReport,
+    rename={'details': 'details_id'},
+    formatters={
+        'severity': choice_decoder(SecurityReport.SEVERITY_CHOICES),
+        'status': choice_decoder(SecurityReport.STATUS_CHOICES),
+    },
+)
+# snapshot of the test for new results, legacy copy for older ones
+_results_test_config = {
+    'test_config': func.coalesce(
+        select(SecurityTestSnapshot.data).where(
+            SecurityTestSnapshot.digest == SecurityResultsSAST.test_snapshot
+        ).scalar_subquery(),
+        SecurityResultsSAST.legacy_test_config,
+    ),
+}
+results_serializer = ColumnarSerializer(
+    SecurityResultsSAST,
+    rename={'test_name': 'name'},
+    post=_results_ended_date,
+    expressions=_results_test_config,
+)
+reports_serializer = ColumnarSerializer(
+    SecurityResultsSAST,
+    rename={'test_name': 'name'},
+    formatters={
+        'scan_time': lambda value: value.replace("T", " ").split(".")[0],
+        'scan_duration': float,
+    },
+    post=_reports_scan_fields,
+    expressions=_results_test_config,
+)
@@ -0,0 +1,102 @@
+import csv
+import hashlib
+import json
+from io import StringIO
+from typing import Iterable, Iterator
+
+SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+SARIF_LEVELS = {
+    'critical': 'error',
+    'high': 'error',
+    'medium': 'warning',
+    'low': 'note',
+    'info': 'note',
+}
+CSV_FIELDS = ('id', 'issue_hash', 'tool_name', 'severity', 'status', 'description', 'endpoints', 'details')
+
+
+def _endpoints(value: str) -> list:
+    return [i for i in (value or '').split('<br />') if i]
+
+
+def csv_chunks(batches: Iterable[list]) -> Iterator[str]:
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def jsonl_chunks(batches: Iterable[list]) -> Iterator[str]:
+    for batch in batches:
+        yield ''.join(f'{json.dumps(i)}\n' for i in batch)
+
+
+def sarif_rule_id(finding: dict) -> str:
+    """ Stable id of the check a finding comes from, description text is the same for all its findings """
+    digest = hashlib.sha1((finding['description'] or '').encode('utf-8')).hexdigest()[:16]
+    return f'{finding["tool_name"] or "unknown"}/{digest}'
+
+
+def sarif_rule(finding: dict) -> dict:
+    return {
+        'id': sarif_rule_id(finding),
+        'shortDescription': {'text': finding['description'] or ''},
+        'defaultConfiguration': {'level': SARIF_LEVELS.get(finding['severity'], 'none')},
+    }
+
+
+def sarif_result(finding: dict, rule_index: int = None) -> dict:
+    result = {
+        'ruleId': sarif_rule_id(finding),
+        'level': SARIF_LEVELS.get(finding['severity'], 'none'),
+        'message': {'text': finding['details'] or finding['description']},
+        'locations': [
+            {'physicalLocation': {'artifactLocation': {'uri': i}}}
+            for i in _endpoints(finding['endpoints'])
+        ],
+        'partialFingerprints': {'issueHash/v1': finding['issue_hash']},
+        'properties': {
+            'severity': finding['severity'],
+            'status': finding['status'],
+        },
+    }
+    if rule_index is not None:
+        result['ruleIndex'] = rule_index
+    return result
+
+
+def _sarif_run_end(tool: str, rules: list) -> str:
+    # rules are known once all results of the run are written, so the tool goes after them
+    driver = {'name': tool or 'unknown', 'rules': rules}
+    return f'], "tool": {json.dumps({"driver": driver})}}}'
+
+
+def sarif_chunks(batches: Iterable[list]) -> Iterator[str]:
+    """ SARIF 2.1.0 log with a run per consecutive tool_name, one run per tool when ordered by tool_name """
+    yield f'{{"version": "2.1.0", "$schema": "{SARIF_SCHEMA}", "runs": ['
+    started, tool, rules, rule_indexes = False, None, [], dict()
+    for batch in batches:
+        chunk = []
+        for finding in batch:
+            if not started or finding['tool_name'] != tool:
+                if started:
+                    chunk.append(_sarif_run_end(tool, rules))
+                    chunk.append(', ')
+                started, tool, rules, rule_indexes = True, finding['tool_name'], [], dict()
+                chunk.append('{"results": [')
+            else:
+                chunk.append(', ')
+            rule_id = sarif_rule_id(finding)
+            if rule_id not in rule_indexes:
+                rule_indexes[rule_id] = len(rules)
+                rules.append(sarif_rule(finding))
+            chunk.append(json.dumps(sarif_result(finding, rule_indexes[rule_id])))
+        yield ''.join(chunk)
+    if started:
+        yield _sarif_run_end(tool, rules)
+    yield ']}'
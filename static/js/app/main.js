@@ -37,6 +37,15 @@ var tableFormatters = {
         }
     },
 
+    tests_last_run(value, row, index) {
+        if (!value) {
+            return '-'
+        }
+        return `<a href="./results?result_id=${value.id}" role="button">
+            ${tableFormatters.reports_status_formatter(value.status || '', value, index)}
+        </a>`
+    },
+
     tests_actions(value, row, index) {
         return `<div class="d-flex justify-content-end">
         <button class="btn btn-default btn-xs btn-table btn-icon__xs test_run mr-2"
@@ -9,6 +9,9 @@ const TableCardFindings = {
                 $('.selectpicker').selectpicker('render')
                 initColoredSelect()
             })
+            $(this.$refs.table).on('expand-row.bs.table', (e, index, row, $detail) => {
+                this.load_details(row, $detail)
+            })
             this.rerender()
         })
 
@@ -59,7 +62,21 @@ const TableCardFindings = {
             })
         },
         clear_search_params() {
-            this.url.searchParams.forEach((v, k) => this.url.searchParams.delete(k))
+            Array.from(this.url.searchParams.keys()).forEach(k => this.url.searchParams.delete(k))
+            this.url.searchParams.set('details', 'none')
+        },
+        load_details(row, $detail) {
+            if (row.details !== null) {
+                return
+            }
+            // archived findings are looked up in the archive of the result being viewed
+            const result_test_id = new URLSearchParams(location.search).get('result_id')
+            fetch(`/api/v1/security_sast/finding_details/${getSelectedProjectId()}/${row.id}?report_id=${result_test_id}`)
+                .then(response => response.json())
+                .then(data => {
+                    row.details = data.details
+                    $detail.find('.details_view').html(`<p><b>Issue Details:</b></p> ${data.details} <br />`)
+                })
         },
         handle_status_filter(status) {
             this.clear_search_params()
@@ -105,7 +122,10 @@ const TableCardFindings = {
             window.findings_formatter_details = ((index, row) => `
                 <div class="col ml-3">
                     <div class="details_view">
-                        <p><b>Issue Details:</b></p> ${row['details']} <br />
+                        ${row['details'] === null ?
+                            '<p><b>Issue Details:</b></p> <i class="spinner-loader"></i>' :
+                            `<p><b>Issue Details:</b></p> ${row['details']} <br />`
+                        }
                     </div>
                 </div>
             `)
@@ -153,6 +173,7 @@ const TableCardFindings = {
         table_url_base() {
             const result_test_id = new URLSearchParams(location.search).get('result_id')
             let url = new URL(`/api/v1/security_sast/findings/${getSelectedProjectId()}/${result_test_id}/`, location.origin)
+            url.searchParams.set('details', 'none')
             return url
         },
     }
@@ -1,14 +1,17 @@
 import json
+import math
+import threading
 from queue import Empty
-from typing import Tuple, Union
+from typing import Optional, Tuple, Union
 from pydantic import ValidationError
 
 from pylon.core.tools import log
 
 from .models.tests import SecurityTestsSAST
 from .models.results import SecurityResultsSAST
+from .caches import missing_rpcs
 from uuid import uuid4
-from tools import rpc_tools, task_tools
+from tools import rpc_tools, task_tools, db
 
 
 def run_test(test: SecurityTestsSAST, config_only=False) -> dict:
@@ -55,6 +58,21 @@ class ValidationErrorPD(Exception):
         return {'loc': self.loc, 'msg': self.msg}
 
 
+def parse_scan_seconds(value) -> Optional[float]:
+    """ Scan duration reported by a scanner in seconds, None when not reported """
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        seconds = float(value)
+    except (TypeError, ValueError):
+        raise ValidationErrorPD('scan_time', f'scan time must be a number of seconds, got {value!r}')
+    if not math.isfinite(seconds) or seconds < 0:
+        raise ValidationErrorPD('scan_time', f'scan time must be a non-negative number of seconds, got {value!r}')
+    return seconds
+
+
 def parse_test_data(project_id: int, request_data: dict,
                     *,
                     rpc=None, common_kwargs: dict = None,
@@ -105,8 +123,9 @@ def parse_test_data(project_id: int, request_data: dict,
     for k, v in request_data.items():
         try:
             # log.info(f'security test create :: parsing :: [{k}]')
-            test_data.update(rpc.call_function_with_timeout(
-                func=f'security_sast_test_create_{k}',
+            test_data.update(missing_rpcs.call(
+                rpc,
+                f'security_sast_test_create_{k}',
                 timeout=2,
                 data=v,
                 **test_create_rpc_kwargs
@@ -130,3 +149,19 @@ def parse_test_data(project_id: int, request_data: dict,
                 return test_data, errors
 
     return test_data, errors
+
+
+def migrate_scan_columns_in_background() -> threading.Thread:
+    def migrate():
+        try:
+            migrated = SecurityResultsSAST.migrate_scan_columns()
+            if migrated:
+                log.info('Migrated scan time of %s results', migrated)
+        except Exception:
+            log.exception('Scan time migration failed')
+        finally:
+            db.session.remove()
+
+    thread = threading.Thread(target=migrate, name='security_sast_scan_time_migration', daemon=True)
+    thread.start()
+    return thread